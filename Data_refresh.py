@@ -1,27 +1,12 @@
-import os
-from salary_check import get_last_month_str, get_salary_data, get_github_excel, get_github_excel1, merge_data_by_project
-import pandas as pd
-from datetime import datetime, timedelta
+from pipeline import SalaryPipeline, REFRESH_STAGES
+from pipeline import SalaryPipeline, REFRESH_STAGES
 
-def refresh_df(pat):
-    salary_month = get_last_month_str()
-    print(f" - 获取工资数据：{salary_month}")
-    salary_df = get_salary_data(salary_month)
-    # 2. 获取GitHub上的核对人信息（PAT 应该来自安全来源）
-    print(" - 获取 GitHub 信息")
-    github_df = get_github_excel(pat)
-    # 3. 合并 & 发送核对报告
-    if not salary_df.empty:
-        final_df = merge_data_by_project(salary_df, github_df)
-        # 获取当前时间并加 8 小时
-        current_time_utc8 = datetime.now() + timedelta(hours=8)
-
-        # 添加到 DataFrame
-        final_df['creation_time'] = current_time_utc8
-        # 保存时标准化时间格式
-        final_df.to_json('output.json', orient='records', date_format='iso')
-    else:
-        print("❗ 没有有效的工资数据可供处理")
+def refresh_df(pat, months=None):
+    # 与工资核对流程处理相同的月份（SALARY_MONTHS），快照才能按（项目组, 工资月份）比对变化
+    # 只执行拉取、合并、写快照三个阶段，不需要邮箱表
+    # （工资核对流程默认已在同一轮写出快照，这里保留给手动刷新快照使用；
+    #   按变化通知（SALARY_NOTIFY_MODE=delta）时只在还没有快照时写出初始快照）
+    SalaryPipeline(pat, months, job='refresh', include_emails=False).run(REFRESH_STAGES)
 
     print("✅ 工资核对流程结束。")
 # 使用示例
@@ -32,4 +17,4 @@ if __name__ == "__main__":
     if not github_pat:
         print("asd")
         raise ValueError("请设置 GITHUB_PAT 环境变量")
-    refresh_df(github_pat)
\ No newline at end of file
+    refresh_df(github_pat)
@@ -0,0 +1,822 @@
+# -*- coding: utf-8 -*-
+"""
+性能基准脚本（离线运行，不访问任何外部服务）
+
+用法:
+    python benchmark.py ingest --rows 100000
+    python benchmark.py classify --rows 50000
+    python benchmark.py window --rows 50000
+    python benchmark.py render --rows 50000
+    python benchmark.py snapshot --source salary_snapshot.json
+    python benchmark.py frame --scale 1 10 100
+    python benchmark.py filter --rows 100000
+    python benchmark.py digest --scale 1 10
+    python benchmark.py http --count 50
+    python benchmark.py verify --scale 1 5 --seed 0 1 2
+    python benchmark.py pipeline --scale 1 10 100
+"""
+import os
+import sys
+import argparse
+import resource
+import tempfile
+import time
+import tracemalloc
+import contextlib
+import subprocess
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pandas as pd
+
+from salary_ingest import STRING_COLUMNS, CATEGORY_COLUMNS, read_salary_workbook
+from synthetic_data import (build_salary_workbook, build_final_frame, generate_dataset,
+                            build_email_workbook, advance_payroll, records_to_workbook)
+from fake_services import FakeUpstream, SMTPSink
+from status_engine import DISPLAY_COLUMNS, classify_records, iter_sections, format_section
+from report_render import ReportRenderer
+from snapshot import LEGACY_TIME_COLUMNS, read_snapshot, write_snapshot
+from time_window import RECENT_UPLOAD_MINUTES, localize_times, uploaded_since
+
+
+# region 原实现（作为基准对照）
+def legacy_read_salary(content):
+    """改造前 get_salary_data 的解析步骤：pd.read_excel 全量读取后再转换、过滤"""
+    df = pd.read_excel(BytesIO(content), sheet_name="Sheet0")
+    df.columns = df.iloc[0] if 'BG' not in df.columns else df.columns
+    df = df.iloc[1:] if 'BG' not in df.columns else df
+    df = df.astype({
+        'BG': 'str',
+        '部门': 'str',
+        '基地': 'str',
+        '项目组': 'str',
+        '上传人': 'str',
+        '终版上传人': 'str',
+    })
+    df['工资月份'] = pd.to_datetime(df['工资月份'])
+    df['上传时间'] = pd.to_datetime(df['上传时间'])
+    df['终版上传时间'] = pd.to_datetime(df['终版上传时间'], errors='coerce')
+    df = df.rename(columns={'是否核对': '成本是否核对'})
+    if '成本是否核对' in df.columns:
+        df['成本是否核对'] = df['成本是否核对'].fillna('未核对')
+    df['成本是否核对'] = df['成本是否核对'].replace({
+        0: '未核对', 1: '已通过', 2: '否', '0': '未核对', '1': '已通过', '2': '否'
+    })
+    filter_condition = (
+            ~df['项目组'].str.contains('共享中心|劳务派遣|招聘中台平台', na=False) &
+            ~df['基地'].str.contains('总部职能', na=False)
+    )
+    return df[filter_condition].reset_index(drop=True)
+
+
+def legacy_classify(final_df, time_threshold):
+    """改造前 send_complete_salary_report 的状态划分：六份过滤副本 + 两次去重 + 整体拼接再格式化"""
+    final_df['上传时间'] = pd.to_datetime(final_df['上传时间'])
+    final_df['终版上传时间'] = pd.to_datetime(final_df['终版上传时间'], errors='coerce')
+    recent_records = final_df[(final_df['上传时间'] >= time_threshold) & (final_df['终版上传时间'].isna())].copy()
+    pending_records = final_df[
+        (final_df['终版上传时间'].isna()) &
+        (final_df['上传时间'] < time_threshold)
+    ].copy()
+    completed_records = final_df[final_df['终版上传时间'].notna()].copy()
+    not_submitted = final_df[
+        (final_df['终版上传时间'].isna()) &
+        (final_df['上传时间'].isna())
+    ].copy()
+    recent_unchecked = recent_records[recent_records['成本是否核对'] == '未核对'].copy()
+    pending_unchecked = pending_records[pending_records['成本是否核对'] == '未核对'].copy()
+    isCost = pd.concat([recent_unchecked, pending_unchecked], ignore_index=True).drop_duplicates()
+    recent_notunchecked = recent_records[recent_records['成本是否核对'] == '否'].copy()
+    pending_notunchecked = pending_records[pending_records['成本是否核对'] == '否'].copy()
+    isnotCost = pd.concat([recent_notunchecked, pending_notunchecked], ignore_index=True).drop_duplicates()
+    for frame, label in [(recent_records, '待核对（新提交）'), (pending_records, '待核对（历史未完成）'),
+                         (completed_records, '已完成'), (not_submitted, '未提交'),
+                         (isCost, '成本未确认'), (isnotCost, '成本未通过')]:
+        if not frame.empty:
+            frame.loc[:, '状态'] = label
+    all_records = pd.concat([isCost, isnotCost, recent_records, pending_records, completed_records, not_submitted],
+                            ignore_index=True)
+    time_format = '%Y-%m-%d %H:%M'
+    all_records['上传时间'] = pd.to_datetime(all_records['上传时间'], errors='coerce').dt.strftime(time_format)
+    all_records['终版上传时间'] = pd.to_datetime(all_records['终版上传时间'], errors='coerce').dt.strftime(time_format)
+    all_records['工资月份'] = pd.to_datetime(all_records['工资月份'], errors='coerce').dt.strftime('%Y-%m')
+    display_columns = ['BG', '部门', '基地', '项目组', '工资月份',
+                       '上传时间', '终版上传时间', '状态', '核对人']
+    return all_records[display_columns]
+
+
+def legacy_merge(salary_df, checker_df):
+    """改造前的 merge_data_by_project：对象列上的 pd.merge"""
+    checker_df = checker_df.rename(columns={'项目': '项目组'})
+    merged_df = pd.merge(left=salary_df, right=checker_df[['项目组', '工资核对人']], on='项目组', how='left')
+    return merged_df.rename(columns={'工资核对人': '核对人'})
+
+
+def legacy_create_status_html(df):
+    """改造前的 create_status_html：每次调用六次过滤 + to_html + 重建整段CSS（样式内容略有删节）"""
+    status_groups = {
+        '成本未确认的': df[df['状态'] == '成本未确认'],
+        '成本未通过的': df[df['状态'] == '成本未通过'],
+        '待核对（新提交）': df[df['状态'] == '待核对（新提交）'],
+        '待核对（历史未完成）': df[df['状态'] == '待核对（历史未完成）'],
+        '已完成': df[df['状态'] == '已完成'],
+        '未提交': df[df['状态'] == '未提交']
+    }
+    tables_html = ""
+    for status, group_df in status_groups.items():
+        if not group_df.empty:
+            table_html = group_df.to_html(index=False, classes='salary-table', border=0, justify='center', na_rep='')
+            tables_html += f"""
+            <div class="status-section">
+                <h3>{status}（共{len(group_df)}条）</h3>
+                {table_html}
+            </div>
+            """
+    now_beijing = (datetime.now() + timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
+    style = """
+                body {{ font-family: 'Microsoft YaHei', Arial, sans-serif; }}
+                .container {{ max-width: 1000px; margin: 0 auto; padding: 20px; }}
+                .salary-table {{ width: 100%; border-collapse: collapse; margin: 10px 0; font-size: 14px; }}
+                .salary-table th {{ background-color: #f5f5f5; padding: 12px; text-align: center; }}
+                .salary-table td {{ padding: 10px; border-bottom: 1px solid #eee; text-align: center; }}
+                .footer {{ margin-top: 20px; color: #777; font-size: 12px; text-align: center; }}
+    """
+    return f"""
+    <html><head><style>{style}</style></head>
+        <body><div class="container"><div class="header"><h2>工资核对进度</h2></div>
+            {tables_html}
+            <div class="footer"><p>本邮件由系统自动发送</p><p>生成时间：{now_beijing}</p></div>
+        </div></body>
+    </html>
+    """
+
+
+def legacy_report_mails(all_records, email_df, now):
+    """改造前 send_complete_salary_report 的分组与收件人查找：返回 [(邮箱单元格, 主题, 分组数据)]，不发送"""
+    time_tolerance = timedelta(minutes=10)
+    is_scheduled_time = abs(now - now.replace(hour=9, minute=0, second=0, microsecond=0)) <= time_tolerance
+    is_near_hour = (now.minute <= 5) or (now.minute >= 55)
+    mails = []
+    if is_near_hour:
+        for checker, group in all_records.groupby('核对人'):
+            has_new = (group['状态'] == '待核对（新提交）').any()
+            if has_new or is_scheduled_time:
+                for emails in email_df.loc[email_df['核对人'] == checker, '邮箱'].values:
+                    mails.append((emails, f"【您的待核对】{now.strftime('%m-%d')} ", group))
+    for checker, group in all_records.groupby('BG'):
+        unconfirmed = group[group['状态'] == '成本未确认']
+        recent_unconfirmed = unconfirmed[pd.to_datetime(unconfirmed['上传时间']) >= (now - timedelta(minutes=30))]
+        if not recent_unconfirmed.empty or is_scheduled_time:
+            for emails in email_df.loc[email_df['核对人'] == checker, '邮箱'].values:
+                mails.append((emails, f"【{checker}工资核对进度】{now.strftime('%m-%d')}", group))
+    return mails
+# endregion
+
+
+def normalize_strings(df):
+    """
+    统一字符串列与时间列的表示后再比较：原实现的空值是 'nan'（pandas 3 的 astype('str') 则保留空值），
+    新实现为缺失值且部分列是 category；原实现的上传时间不带时区，新实现为北京时间
+    """
+    df = localize_times(df.copy())
+    for col in set(STRING_COLUMNS) | set(CATEGORY_COLUMNS):
+        if col in df.columns:
+            df[col] = df[col].astype(object).where(df[col].notna(), 'nan')
+    return df
+
+
+def measure(func, *args, **kwargs):
+    """
+    记录函数耗时与Python堆内存峰值（tracemalloc 本身开销较大，计时与测内存分两次执行）
+
+    返回:
+        tuple: (返回值, 耗时秒, 峰值MB)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def print_comparison(title, rows):
+    """输出对照表：rows 为 (名称, 耗时秒, 峰值MB) 列表，第一行为基准"""
+    print(f"\n{title}")
+    print(f"{'实现':<16}{'耗时(s)':>10}{'峰值内存(MB)':>14}{'加速比':>8}")
+    base_time = rows[0][1]
+    for name, elapsed, peak in rows:
+        print(f"{name:<16}{elapsed:>10.3f}{peak:>14.1f}{base_time / elapsed:>8.2f}")
+
+
+def bench_ingest(rows):
+    print(f"生成 {rows} 行合成工资表...")
+    content = build_salary_workbook(rows)
+    print(f"xlsx 大小：{len(content) / 1024 / 1024:.1f} MB")
+
+    legacy_df, legacy_time, legacy_peak = measure(legacy_read_salary, content)
+    stream_df, stream_time, stream_peak = measure(read_salary_workbook, content)
+
+    pd.testing.assert_frame_equal(
+        normalize_strings(legacy_df), normalize_strings(stream_df), check_dtype=False
+    )
+    print_comparison(f"工资表解析（保留 {len(stream_df)} 行）", [
+        ('pd.read_excel', legacy_time, legacy_peak),
+        ('流式只读', stream_time, stream_peak),
+    ])
+
+
+def expand_sections(classified):
+    """把分类结果按分节展开成与原实现 all_records 相同的长表（仅用于一致性校验）"""
+    parts = [format_section(rows, label) for _, label, rows in iter_sections(classified)]
+    return pd.concat(parts, ignore_index=True)
+
+
+def bench_classify(rows):
+    final_df = build_final_frame(rows)
+    time_threshold = datetime(2026, 7, 10, 9, 0) - timedelta(hours=1.1)
+
+    legacy_df, legacy_time, legacy_peak = measure(legacy_classify, final_df.copy(), time_threshold)
+    classified, new_time, new_peak = measure(classify_records, final_df, time_threshold)
+
+    pd.testing.assert_frame_equal(legacy_df, expand_sections(classified), check_dtype=False)
+    legacy_bytes = legacy_df.memory_usage(deep=True).sum() / 1024 / 1024
+    new_bytes = classified.memory_usage(deep=True).sum() / 1024 / 1024
+    print_comparison(f"状态分类（{rows} 行）", [
+        ('六份副本+concat', legacy_time, legacy_peak),
+        ('单次向量化', new_time, new_peak),
+    ])
+    print(f"结果占用：原实现 {legacy_bytes:.1f} MB（{len(legacy_df)} 行），"
+          f"分类引擎 {new_bytes:.1f} MB（{len(classified)} 行）")
+
+
+def bench_window(rows):
+    """BG 成本未确认提醒的 30 分钟判断：逐组重新解析已格式化的时间字符串 vs 分类时整列算一次的布尔列"""
+    final_df = build_final_frame(rows)
+    now = datetime(2026, 7, 10, 9, 0)
+    legacy_records = legacy_classify(final_df.copy(), now - timedelta(hours=1.1))
+    classified = classify_records(localize_times(final_df.copy()), now - timedelta(hours=1.1))
+    since = now - timedelta(minutes=RECENT_UPLOAD_MINUTES)
+
+    def legacy():
+        counts = {}
+        for bg, group in legacy_records.groupby('BG'):
+            unconfirmed = group[group['状态'] == '成本未确认']
+            counts[bg] = int((pd.to_datetime(unconfirmed['上传时间']) >= since).sum())
+        return counts
+
+    def current():
+        is_new = pd.Series(uploaded_since(classified['上传时间'], since), index=classified.index)
+        counts = {}
+        for bg, group in classified.groupby('BG', observed=True):
+            unconfirmed = group[group['成本状态'] == '成本未确认']
+            counts[bg] = int(is_new[unconfirmed.index].sum())
+        return counts
+
+    legacy_counts, legacy_time, legacy_peak = measure(legacy)
+    counts, new_time, new_peak = measure(current)
+    legacy_counts.pop('nan', None)
+    assert legacy_counts == counts, (legacy_counts, counts)
+    print_comparison(f"BG 30分钟上传判断（{rows} 行，{len(counts)} 个BG）", [
+        ('逐组解析字符串', legacy_time, legacy_peak),
+        ('带时区布尔列', new_time, new_peak),
+    ])
+
+
+def bench_render(rows, addresses=2):
+    final_df = build_final_frame(rows)
+    time_threshold = datetime(2026, 7, 10, 9, 0) - timedelta(hours=1.1)
+    legacy_records = legacy_classify(final_df.copy(), time_threshold)
+    classified = classify_records(final_df, time_threshold)
+
+    def render_legacy():
+        # 原流程：每个邮箱地址各渲染一次，核对人报告和BG报告分别渲染
+        pages = 0
+        for key in ('核对人', 'BG'):
+            for _, group in legacy_records.groupby(key):
+                for _ in range(addresses):
+                    legacy_create_status_html(group)
+                    pages += 1
+        return pages
+
+    def render_compiled():
+        renderer = ReportRenderer()
+        pages = 0
+        for key in ('核对人', 'BG'):
+            for _, group in classified.groupby(key, observed=True):
+                for _ in range(addresses):
+                    renderer.render(group)
+                    pages += 1
+        return renderer
+
+    pages, legacy_time, legacy_peak = measure(render_legacy)
+    renderer, new_time, new_peak = measure(render_compiled)
+    print_comparison(f"报告渲染（{rows} 行，{pages} 封邮件，每人 {addresses} 个邮箱）", [
+        ('to_html', legacy_time, legacy_peak),
+        ('预编译+缓存', new_time, new_peak),
+    ])
+    print(f"渲染 {renderer.misses} 次，缓存复用 {renderer.hits} 次")
+
+
+def bench_digest(scales, seed=0):
+    """对比单独发送与汇总发送：定时报告时刻（全部报告都要发送），BG联系人均为某个核对人本人"""
+    from salary_check import merge_data_by_project, _render_grouped_reports
+    from recipients import RecipientDirectory
+
+    now = datetime(2026, 7, 10, 9, 0)
+    print(f"\n单独发送 vs 汇总发送（09:00 定时报告，BG联系人兼任核对人）")
+    print(f"{'规模':>6}{'方式':>8}{'邮件数':>8}{'收件人次':>10}{'耗时(ms)':>10}")
+    for scale in scales:
+        dataset = generate_dataset(scale, seed, now=datetime(2026, 7, 10, 8, 0))
+        checker_df = pd.read_excel(BytesIO(dataset['checker_xlsx']), sheet_name='Sheet1')
+        email_df = pd.read_excel(BytesIO(build_email_workbook(dataset['checkers'], seed=seed, bg_from_checkers=True)),
+                                 sheet_name='Sheet1')
+        final_df = merge_data_by_project(read_salary_workbook(records_to_workbook(dataset['records'])), checker_df)
+        classified = classify_records(final_df, now - timedelta(hours=1.1))
+
+        for label, digest in (('单独', False), ('汇总', True)):
+            with contextlib.redirect_stdout(open(os.devnull, 'w')) as quiet:
+                start = time.perf_counter()
+                outgoing = _render_grouped_reports(classified, RecipientDirectory(email_df), now,
+                                                   True, True, digest=digest)
+                seconds = time.perf_counter() - start
+                quiet.close()
+            print(f"{scale:>6g}{label:>8}{len(outgoing):>8}{sum(len(mail.to) for mail in outgoing):>10}"
+                  f"{seconds * 1000:>10.2f}")
+
+
+def legacy_filter(df):
+    """改造前的项目组/基地过滤：整列 str.contains 正则"""
+    return (
+        ~df['项目组'].str.contains('共享中心|劳务派遣|招聘中台平台', na=False) &
+        ~df['基地'].str.contains('总部职能', na=False)
+    ).to_numpy()
+
+
+def bench_filter(rows, repeat=20):
+    from filter_rules import FilterRules, DEFAULT_RULES
+    from synthetic_data import generate_payroll_records
+
+    records = pd.DataFrame(generate_payroll_records(rows, seed=0, now=datetime(2026, 7, 10, 8, 0)))
+    legacy_df = records[['项目组', '基地']].astype(str)
+    new_df = records[['项目组', '基地']].astype('category')
+
+    def run_legacy():
+        for _ in range(repeat):
+            mask = legacy_filter(legacy_df)
+        return mask
+
+    def run_compiled():
+        for _ in range(repeat):
+            # 每次重新编译，计入编译开销
+            mask = FilterRules(DEFAULT_RULES).mask(new_df)
+        return mask
+
+    legacy_mask, legacy_time, legacy_peak = measure(run_legacy)
+    new_mask, new_time, new_peak = measure(run_compiled)
+    assert (legacy_mask == new_mask).all()
+    print_comparison(f"项目组/基地过滤（{rows} 行，保留 {int(new_mask.sum())} 行，重复 {repeat} 次）", [
+        ('str.contains', legacy_time, legacy_peak),
+        ('编译规则+去重', new_time, new_peak),
+    ])
+
+
+def bench_frame(scales, seed=0):
+    """对比合并后数据的内存占用：对象列+'nan' 字符串 与 category+缺失值"""
+    from salary_check import merge_data_by_project
+
+    time_threshold = datetime(2026, 7, 10, 9, 0) - timedelta(hours=1.1)
+    print(f"\n合并后数据内存（memory_usage(deep=True)）与 合并+分类 的峰值内存")
+    print(f"{'规模':>6}{'行数':>8}{'原数据(MB)':>12}{'新数据(MB)':>12}{'减少':>7}"
+          f"{'原峰值(MB)':>12}{'新峰值(MB)':>12}")
+    for scale in scales:
+        dataset = generate_dataset(scale, seed, now=datetime(2026, 7, 10, 8, 0))
+        content = records_to_workbook(dataset['records'])
+        checker_df = pd.read_excel(BytesIO(dataset['checker_xlsx']), sheet_name='Sheet1')
+
+        legacy_salary = legacy_read_salary(content)
+        new_salary = read_salary_workbook(content)
+
+        def legacy_flow():
+            merged = legacy_merge(legacy_salary, checker_df)
+            legacy_classify(merged.copy(), time_threshold)
+            return merged
+
+        def new_flow():
+            merged = merge_data_by_project(new_salary, checker_df)
+            classify_records(merged, time_threshold)
+            return merged
+
+        legacy_df, _, legacy_peak = measure(legacy_flow)
+        new_df, _, new_peak = measure(new_flow)
+        pd.testing.assert_frame_equal(normalize_strings(legacy_df), normalize_strings(new_df), check_dtype=False)
+        legacy_mb = legacy_df.memory_usage(deep=True).sum() / 1024 / 1024
+        new_mb = new_df.memory_usage(deep=True).sum() / 1024 / 1024
+        print(f"{scale:>6g}{len(new_df):>8}{legacy_mb:>12.2f}{new_mb:>12.2f}{1 - new_mb / legacy_mb:>7.0%}"
+              f"{legacy_peak:>12.2f}{new_peak:>12.2f}")
+
+
+def legacy_read_output_json(path):
+    """旧快照的读取方式：records JSON + 逐列解析ISO时间字符串"""
+    df = pd.read_json(path, orient='records', convert_dates=False)
+    for col in LEGACY_TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def bench_snapshot(source, repeat=20):
+    # 源文件可以是新快照或旧 output.json，统一重新写出两种格式对比
+    legacy_df = read_snapshot(source)
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, 'output.json')
+        new_path = os.path.join(tmp, 'salary_snapshot.json')
+        legacy_df.to_json(legacy_path, orient='records', date_format='iso')
+        write_snapshot(legacy_df, new_path)
+
+        restored = read_snapshot(new_path)
+        pd.testing.assert_frame_equal(
+            legacy_df.astype(object).where(legacy_df.notna(), None),
+            restored.astype(object).where(restored.notna(), None),
+            check_dtype=False
+        )
+
+        def load(func, path):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                func(path)
+            return (time.perf_counter() - start) / repeat
+
+        legacy_size = os.path.getsize(legacy_path) / 1024
+        new_size = os.path.getsize(new_path) / 1024
+        legacy_time = load(legacy_read_output_json, legacy_path)
+        new_time = load(read_snapshot, new_path)
+
+    print(f"\n快照（{len(legacy_df)} 行，{len(legacy_df.columns)} 列）")
+    print(f"{'格式':<16}{'大小(KB)':>10}{'读取(ms)':>10}")
+    print(f"{'records JSON':<16}{legacy_size:>10.1f}{legacy_time * 1000:>10.2f}")
+    print(f"{'列存储+字典编码':<16}{new_size:>10.1f}{new_time * 1000:>10.2f}")
+    print(f"体积减少 {1 - new_size / legacy_size:.0%}，读取加速 {legacy_time / new_time:.1f} 倍")
+
+
+# region 新旧实现等价性校验
+# 分节顺序与改造前 create_status_html 一致
+LEGACY_SECTIONS = [('成本未确认的', '成本未确认'), ('成本未通过的', '成本未通过'),
+                   ('待核对（新提交）', '待核对（新提交）'), ('待核对（历史未完成）', '待核对（历史未完成）'),
+                   ('已完成', '已完成'), ('未提交', '未提交')]
+
+
+def _display_value(value):
+    # 已知且有意的差异：改造前字符串列的空值被 astype(str) 变成 'nan' 显示在邮件里，现在显示为空
+    if value is None or (not isinstance(value, str) and pd.isna(value)) or value == 'nan':
+        return ''
+    return str(value)
+
+
+def _section_rows(display):
+    return tuple(tuple(_display_value(value) for value in record)
+                 for record in display[DISPLAY_COLUMNS].itertuples(index=False, name=None))
+
+
+def legacy_engine(dataset, now, hours=1.1):
+    """
+    改造前的完整实现：pd.read_excel 解析 → 对象列合并 → 六份副本分类 → 逐个邮箱单元格发送
+
+    返回:
+        dict: 邮箱 -> 排序后的 [(主题, ((分节标题, 行...), ...))]
+    """
+    from recipients import split_addresses
+
+    salary_df = legacy_read_salary(records_to_workbook(dataset['records']))
+    checker_df = pd.read_excel(BytesIO(dataset['checker_xlsx']), sheet_name='Sheet1')
+    email_df = pd.read_excel(BytesIO(dataset['email_xlsx']), sheet_name='Sheet1')
+    final_df = legacy_merge(salary_df, checker_df)
+    all_records = legacy_classify(final_df, now - timedelta(hours=hours))
+    if not all_records['状态'].isin(['待核对（新提交）', '待核对（历史未完成）']).any():
+        return {}
+    outputs = {}
+    for cell, subject, group in legacy_report_mails(all_records, email_df, now):
+        sections = tuple((title, _section_rows(group[group['状态'] == label]))
+                         for title, label in LEGACY_SECTIONS if (group['状态'] == label).any())
+        for address in split_addresses(cell):
+            outputs.setdefault(address, []).append((subject, sections))
+    return {address: sorted(mails) for address, mails in outputs.items()}
+
+
+def current_engine(dataset, now, hours=1.1, digest=False):
+    """
+    当前实现：流式解析 → 共享类别合并 → 向量化分类 → 收件人目录分组（展开到每个邮箱）
+
+    digest=True 时按汇总发送的分组展开：每个邮箱收到的报告应与单独发送时完全相同
+
+    返回:
+        dict: 同 legacy_engine
+    """
+    from salary_check import merge_data_by_project, classify_for_report, _collect_report_units, _digest_groups
+    from recipients import RecipientDirectory
+    from time_window import report_window
+
+    salary_df = read_salary_workbook(records_to_workbook(dataset['records']))
+    checker_df = pd.read_excel(BytesIO(dataset['checker_xlsx']), sheet_name='Sheet1')
+    email_df = pd.read_excel(BytesIO(dataset['email_xlsx']), sheet_name='Sheet1')
+    final_df = merge_data_by_project(salary_df, checker_df)
+    window = report_window(now)
+    all_records = classify_for_report(final_df, hours, None, window)
+    if all_records is None:
+        return {}
+    units = _collect_report_units(all_records, RecipientDirectory(email_df), now,
+                                  window.is_near_hour, window.is_scheduled_time)
+    mails = _digest_groups(units) if digest else [(unit.to, [unit]) for unit in units]
+    outputs = {}
+    for addresses, parts in mails:
+        for unit in parts:
+            sections = tuple((title, _section_rows(format_section(rows, label)))
+                             for title, label, rows in iter_sections(unit.rows))
+            for address in addresses:
+                outputs.setdefault(address, []).append((unit.subject, sections))
+    return {address: sorted(mails) for address, mails in outputs.items()}
+
+
+# 参与校验的实现（键为名称）：新的优化实现在此登记，全部与 legacy_engine 的结果逐邮箱比对
+REPORT_ENGINES = {
+    'current': current_engine,
+    'digest': lambda dataset, now: current_engine(dataset, now, digest=True),
+}
+
+# 校验时刻：09:00 定时报告、整点核对人提醒、非整点（只有BG的30分钟提醒）
+VERIFY_TIMES = [datetime(2026, 7, 10, 9, 0), datetime(2026, 7, 10, 14, 58), datetime(2026, 7, 10, 16, 30)]
+
+
+def _describe_difference(expected, actual):
+    for address in sorted(set(expected) | set(actual)):
+        want, got = expected.get(address, []), actual.get(address, [])
+        if want != got:
+            want_subjects = [subject for subject, _ in want]
+            got_subjects = [subject for subject, _ in got]
+            if want_subjects != got_subjects:
+                return f"{address}：原实现 {want_subjects}，新实现 {got_subjects}"
+            for (subject, want_sections), (_, got_sections) in zip(want, got):
+                for (title, want_rows), (got_title, got_rows) in zip(want_sections, got_sections):
+                    if (title, want_rows) != (got_title, got_rows):
+                        extra = set(got_rows) - set(want_rows)
+                        missing = set(want_rows) - set(got_rows)
+                        return (f"{address} {subject.strip()} 分节 {title}/{got_title}：原 {len(want_rows)} 行，"
+                                f"新 {len(got_rows)} 行；多出 {list(extra)[:2]}，缺少 {list(missing)[:2]}")
+                if [t for t, _ in want_sections] != [t for t, _ in got_sections]:
+                    return f"{address} {subject.strip()}：分节不同"
+    return None
+
+
+def verify_engines(scales, seeds, edge_cases=True, engines=None):
+    """
+    在确定性的合成数据上逐个比对各实现与改造前实现的“收件人 → 报告”结果
+
+    返回:
+        bool: 全部一致
+    """
+    engines = engines or list(REPORT_ENGINES)
+    print(f"\n新旧实现等价性校验（实现：{'、'.join(engines)}；边界情况：{'是' if edge_cases else '否'}）")
+    print(f"{'规模':>6}{'种子':>6}{'时刻':>8}{'行数':>8}{'邮件数':>8}{'原(s)':>8}  结果")
+    ok = True
+    for scale in scales:
+        for seed in seeds:
+            for now in VERIFY_TIMES:
+                dataset = generate_dataset(scale, seed, now=now, edge_cases=edge_cases)
+                with contextlib.redirect_stdout(open(os.devnull, 'w')) as quiet:
+                    start = time.perf_counter()
+                    expected = legacy_engine(dataset, now)
+                    legacy_time = time.perf_counter() - start
+                    results = {name: REPORT_ENGINES[name](dataset, now) for name in engines}
+                    quiet.close()
+                mails = sum(len(mails) for mails in expected.values())
+                verdicts = []
+                for name, actual in results.items():
+                    difference = _describe_difference(expected, actual)
+                    ok &= difference is None
+                    verdicts.append(f"{name} 一致" if difference is None else f"{name} 不一致：{difference}")
+                print(f"{scale:>6g}{seed:>6}{now.strftime('%H:%M'):>8}{len(dataset['records']):>8}{mails:>8}"
+                      f"{legacy_time:>8.2f}  {'；'.join(verdicts)}")
+    print("✅ 全部一致" if ok else "❌ 存在不一致")
+    return ok
+# endregion
+
+
+# region 全流程基准（本地替身服务）
+def _pipeline_env(upstream, sink, workdir):
+    host, port = sink.address
+    return {
+        'SALARY_API_URL': upstream.salary_url,
+        'GITHUB_CONTENTS_URL': upstream.contents_url,
+        'GITHUB_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'GITHUB_CACHE_TTL': '0',
+        'SNAPSHOT_PATH': os.path.join(workdir, 'salary_snapshot.json'),
+        'SMTP_SERVER': host,
+        'SMTP_PORT': str(port),
+        'SMTP_USER': 'bench@example.com',
+        'SMTP_PASS': 'bench',
+        'SMTP_RATE_LIMIT': '0',
+        'SALARY_NOTIFY_MODE': 'delta',
+        'METRICS_PATH': os.path.join(workdir, 'metrics.jsonl'),
+        'OUTBOX_PATH': os.path.join(workdir, 'outbox.sqlite3'),
+    }
+
+
+def bench_http(count=50, failures=2, seed=0):
+    """
+    对比工资接口请求方式（本地替身服务）
+
+    1. 逐次 requests.post（每次新建连接）与共享 HttpClient（keep-alive 连接池）的耗时和建连次数
+    2. 接口连续返回 failures 次 503 时，原方式直接失败（返回空表），HttpClient 退避重试后成功
+    3. 开启 gzip 时的传输字节数，解析结果与未压缩一致
+    """
+    import requests
+    from http_client import HttpClient
+
+    content = records_to_workbook(generate_dataset(1, seed)['records'])
+    expected = read_salary_workbook(content)
+
+    def legacy_download(url):
+        response = requests.post(url, json={'body': {}}, timeout=10)
+        response.raise_for_status()
+        return response.content
+
+    def client_download(client, url):
+        with client.post(url, name='salary', json={'body': {}}).body as body:
+            return body.read()
+
+    def legacy_fetch(url):
+        return read_salary_workbook(legacy_download(url))
+
+    def client_fetch(client, url):
+        with client.post(url, name='salary', json={'body': {}}).body as body:
+            return read_salary_workbook(body)
+
+    with FakeUpstream() as upstream, HttpClient(backoff=0.05) as client, \
+            contextlib.redirect_stdout(open(os.devnull, 'w')) as quiet:
+        upstream.payroll = content
+        rows = []
+        # 只计传输（不含解析），解析耗时两种方式相同
+        for label, fetch in (('requests.post', lambda: legacy_download(upstream.salary_url)),
+                             ('HttpClient', lambda: client_download(client, upstream.salary_url))):
+            upstream.connections = 0
+            start = time.perf_counter()
+            for _ in range(count):
+                fetch()
+            rows.append((label, (time.perf_counter() - start) / count, upstream.connections))
+
+        recovered = []
+        for label, fetch in (('requests.post', lambda: legacy_fetch(upstream.salary_url)),
+                             ('HttpClient', lambda: client_fetch(client, upstream.salary_url))):
+            upstream.fail_next = failures
+            try:
+                recovered.append((label, len(fetch()) == len(expected)))
+            except Exception:
+                recovered.append((label, False))
+            upstream.fail_next = 0
+
+        transferred = []
+        for compress in (False, True):
+            upstream.compress = compress
+            before = upstream.bytes_sent
+            df = client_fetch(client, upstream.salary_url)
+            pd.testing.assert_frame_equal(df, expected)
+            transferred.append(upstream.bytes_sent - before)
+        quiet.close()
+
+    print(f"\n工资接口请求（{count} 次，每次 {len(content) / 1024:.0f} KB）")
+    print(f"{'方式':<16}{'单次传输(ms)':>12}{'建连次数':>10}")
+    for label, seconds, connections in rows:
+        print(f"{label:<16}{seconds * 1000:>12.2f}{connections:>10}")
+    print(f"接口连续 {failures} 次 503：" + "，".join(
+        f"{label} {'成功' if ok else '失败'}" for label, ok in recovered))
+    print(f"gzip 传输 {transferred[1] / 1024:.1f} KB（未压缩 {transferred[0] / 1024:.1f} KB）")
+
+
+def bench_pipeline(scale, seed=0):
+    """
+    在本地替身服务上跑完整的数据刷新 + 工资核对流程
+
+    1. 用初始工资表执行 Data_refresh.refresh_df，生成快照
+    2. 工资表推进（部分新上传/上传终版）后执行 run_salary_check_process，按变化发送邮件并用同一份数据写快照
+    """
+    import metrics
+    import salary_check
+    import Data_refresh
+    from salary_check import GITHUB_CHECKER_FILE, GITHUB_EMAIL_FILE
+
+    dataset = generate_dataset(scale, seed)
+    initial_xlsx = records_to_workbook(dataset['records'])
+    advanced_xlsx = records_to_workbook(advance_payroll(dataset['records'], seed=seed + 1))
+
+    with FakeUpstream() as upstream, SMTPSink() as sink, tempfile.TemporaryDirectory() as workdir:
+        upstream.files[GITHUB_CHECKER_FILE] = dataset['checker_xlsx']
+        upstream.files[GITHUB_EMAIL_FILE] = dataset['email_xlsx']
+        saved_env = {key: os.environ.get(key) for key in _pipeline_env(upstream, sink, workdir)}
+        os.environ.update(_pipeline_env(upstream, sink, workdir))
+        log = open(os.path.join(workdir, 'pipeline.log'), 'w', encoding='utf-8')
+        try:
+            with contextlib.redirect_stdout(log):
+                upstream.payroll = initial_xlsx
+                start = time.perf_counter()
+                Data_refresh.refresh_df('bench-pat')
+                refresh_time = time.perf_counter() - start
+                refresh_run = metrics.last_run
+
+                upstream.payroll = advanced_xlsx
+                start = time.perf_counter()
+                salary_check.run_salary_check_process('bench-pat')
+                check_time = time.perf_counter() - start
+                check_run = metrics.last_run
+        finally:
+            log.close()
+            for key, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    send_time = sum(record['seconds'] for record in check_run.stages if record['stage'] == 'send')
+    print(f"\n全流程（规模 x{scale}：{len(dataset['records'])} 行工资记录，{len(dataset['checkers'])} 个核对人）")
+    # 阶段耗时直接取流程内置的运行指标
+    print(refresh_run.format_table())
+    print(check_run.format_table())
+    print(f"数据刷新 {refresh_time:.3f}s，工资核对 {check_time:.3f}s，峰值RSS {peak_rss:.0f} MB")
+    print(f"上游请求 {upstream.requests} 次（304 {upstream.not_modified} 次），下载 {upstream.bytes_sent / 1024:.0f} KB")
+    throughput = sink.messages / send_time if send_time else 0.0
+    print(f"SMTP：{sink.messages} 封 / {sink.recipients} 个收件人 / {sink.sessions} 个会话，"
+          f"吞吐 {throughput:.1f} 封/s")
+# endregion
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="工资核对流程性能基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+    ingest = sub.add_parser('ingest', help='对比工资表解析实现')
+    ingest.add_argument('--rows', type=int, default=100000)
+    classify = sub.add_parser('classify', help='对比状态分类实现')
+    classify.add_argument('--rows', type=int, default=50000)
+    window = sub.add_parser('window', help='对比上传时间窗口判断实现')
+    window.add_argument('--rows', type=int, default=50000)
+    render = sub.add_parser('render', help='对比报告渲染实现')
+    render.add_argument('--rows', type=int, default=50000)
+    render.add_argument('--addresses', type=int, default=2)
+    snapshot = sub.add_parser('snapshot', help='对比快照格式的体积与读取耗时')
+    snapshot.add_argument('--source', default='salary_snapshot.json')
+    frame = sub.add_parser('frame', help='对比合并后数据的内存占用（category+缺失值）')
+    frame.add_argument('--scale', type=float, nargs='+', default=[1.0, 10.0, 100.0])
+    frame.add_argument('--seed', type=int, default=0)
+    digest = sub.add_parser('digest', help='对比单独发送与汇总发送的邮件数和渲染耗时')
+    digest.add_argument('--scale', type=float, nargs='+', default=[1.0, 10.0])
+    digest.add_argument('--seed', type=int, default=0)
+    filter_ = sub.add_parser('filter', help='对比项目组/基地过滤实现')
+    filter_.add_argument('--rows', type=int, default=100000)
+    http = sub.add_parser('http', help='对比工资接口请求方式（连接复用、重试、gzip）')
+    http.add_argument('--count', type=int, default=50)
+    http.add_argument('--failures', type=int, default=2)
+    verify = sub.add_parser('verify', help='在合成数据上校验新旧实现的收件人→报告结果一致')
+    verify.add_argument('--scale', type=float, nargs='+', default=[1.0, 5.0])
+    verify.add_argument('--seed', type=int, nargs='+', default=[0, 1, 2])
+    verify.add_argument('--no-edge-cases', action='store_true', help='只用常规数据，不混入边界情况')
+    verify.add_argument('--engine', nargs='+', choices=sorted(REPORT_ENGINES), help='只校验指定实现')
+    pipeline = sub.add_parser('pipeline', help='在本地替身服务上跑完整流程')
+    pipeline.add_argument('--scale', type=float, nargs='+', default=[1.0],
+                          help='相对当前快照的规模倍数，可给多个（每个规模在独立进程中运行以单独统计RSS）')
+    pipeline.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args(argv)
+    if args.command == 'ingest':
+        bench_ingest(args.rows)
+    elif args.command == 'classify':
+        bench_classify(args.rows)
+    elif args.command == 'window':
+        bench_window(args.rows)
+    elif args.command == 'render':
+        bench_render(args.rows, args.addresses)
+    elif args.command == 'snapshot':
+        bench_snapshot(args.source)
+    elif args.command == 'frame':
+        bench_frame(args.scale, args.seed)
+    elif args.command == 'digest':
+        bench_digest(args.scale, args.seed)
+    elif args.command == 'filter':
+        bench_filter(args.rows)
+    elif args.command == 'http':
+        bench_http(args.count, args.failures)
+    elif args.command == 'verify':
+        if not verify_engines(args.scale, args.seed, not args.no_edge_cases, args.engine):
+            sys.exit(1)
+    elif args.command == 'pipeline':
+        if len(args.scale) == 1:
+            bench_pipeline(args.scale[0], args.seed)
+        else:
+            for scale in args.scale:
+                subprocess.run([sys.executable, __file__, 'pipeline', '--scale', str(scale),
+                                '--seed', str(args.seed)], check=True)
+
+
+if __name__ == "__main__":
+    main()
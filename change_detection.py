@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from snapshot import read_snapshot
+from time_window import localize_times
+
+
+# 状态快照的主键与需要比对的列
+STATE_KEY = ['项目组', '工资月份']
+STATE_COLUMNS = ['上传时间', '终版上传时间', '成本是否核对']
+# 主键为空或重复的行无法按主键对应，用这些列连同主键、状态列整体识别
+IDENTITY_COLUMNS = ['BG', '部门', '基地']
+# 变化类型（列名）
+CHANGE_COLUMNS = ['新上传', '新终版', '成本变化']
+
+
+def _normalize_state(df):
+    """只保留主键、识别列和状态列，工资月份统一为 datetime，上传时间统一为北京时间，文本列统一为对象"""
+    state = df[[col for col in STATE_KEY + IDENTITY_COLUMNS + STATE_COLUMNS if col in df.columns]].copy()
+    if '工资月份' in state.columns:
+        state['工资月份'] = pd.to_datetime(state['工资月份'], errors='coerce')
+    # 旧快照的上传时间不带时区，与本轮数据统一为北京时间后再比较
+    localize_times(state)
+    for col in ['项目组', '成本是否核对'] + IDENTITY_COLUMNS:
+        if col in state.columns:
+            state[col] = state[col].astype(object)
+    return state
+
+
+def load_previous_state(path=None):
+    """
+    读取上一次数据刷新写出的快照，作为变化比对的基准
+
+    参数:
+        path (str): 快照路径，默认读取 SNAPSHOT_PATH（salary_snapshot.json，缺失时回退 output.json）
+
+    返回:
+        pd.DataFrame: 主键+状态列；快照不存在或无法读取时返回 None
+    """
+    try:
+        previous = read_snapshot(path)
+    except Exception as e:
+        print(f"读取状态快照失败，本轮按时间窗口判断新增: {str(e)}")
+        return None
+    if previous is None:
+        print("未找到状态快照，本轮按时间窗口判断新增")
+        return None
+    if previous.empty or not set(STATE_KEY).issubset(previous.columns):
+        return None
+    return _normalize_state(previous)
+
+
+def detect_changes(previous, current):
+    """
+    逐行比对当前数据与上次快照，找出真实发生的状态变化
+
+    参数:
+        previous (pd.DataFrame): 上次快照（load_previous_state 的结果）
+        current (pd.DataFrame): 本轮合并后的工资数据
+
+    返回:
+        pd.DataFrame: 与 current 同索引的布尔列
+            - 新上传：上传时间首次出现或发生变化（重新上传）
+            - 新终版：终版上传时间首次出现或发生变化
+            - 成本变化：成本是否核对与上次不同（含新出现的项目组）
+            项目组或工资月份为空、或主键在任一侧重复的行无法按主键对应：与上次快照中完全相同
+            （主键+识别列+状态列，空值视为相等）的行视为没有变化，否则视为新出现
+    """
+    cur = _normalize_state(current)
+    # 只按主键连接主键非空且唯一的行（pandas 会把空值键互相连接，重复键只能对上其中一行）
+    prev_ambiguous = (previous[STATE_KEY].isna().any(axis=1)
+                      | previous.duplicated(STATE_KEY, keep=False))
+    prev = previous.loc[~prev_ambiguous, [col for col in STATE_KEY + STATE_COLUMNS if col in previous.columns]]
+    # 左连接保持 current 的行数和顺序
+    merged = cur.merge(prev, on=STATE_KEY, how='left', suffixes=('', '_prev'))
+
+    upload = merged['上传时间']
+    final = merged['终版上传时间']
+    cost, cost_prev = merged['成本是否核对'], merged['成本是否核对_prev']
+    changes = pd.DataFrame({
+        '新上传': upload.notna() & (upload != merged['上传时间_prev']),
+        '新终版': final.notna() & (final != merged['终版上传时间_prev']),
+        '成本变化': (cost != cost_prev) & ~(cost.isna() & cost_prev.isna()),
+    })
+    changes.index = current.index
+
+    # 主键为空/重复的行，以及上次主键为空/重复的行：整行比对（merge 中空值与空值相等），
+    # 上次出现过完全相同的行则没有变化
+    prev_ambiguous_keys = pd.MultiIndex.from_frame(previous.loc[prev_ambiguous, STATE_KEY])
+    ambiguous = ((cur[STATE_KEY].isna().any(axis=1) | cur.duplicated(STATE_KEY, keep=False)).to_numpy()
+                 | pd.MultiIndex.from_frame(cur[STATE_KEY]).isin(prev_ambiguous_keys))
+    if ambiguous.any():
+        columns = [col for col in cur.columns if col in previous.columns]
+        seen = previous[columns].drop_duplicates()
+        matched = cur.loc[ambiguous, columns].merge(seen, on=columns, how='left', indicator=True)
+        unchanged = np.flatnonzero(ambiguous)[(matched['_merge'] == 'both').to_numpy()]
+        changes.iloc[unchanged] = False
+    return changes
+
+
+def summarize_changes(changes):
+    """输出各类变化的行数"""
+    counts = changes.sum()
+    print("本轮变化：" + "，".join(f"{col} {int(counts[col])} 条" for col in CHANGE_COLUMNS))
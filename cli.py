@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+命令行入口：工资核对 / 快照刷新 / 预演 / 性能基准
+
+入口本身只导入标准库；pandas、requests、openpyxl 以及邮件相关模块在确定需要执行的阶段时才导入。
+按变化通知时，不在整点或定时报告窗口内的 check/dry-run 在拉取任何数据之前直接结束。
+每次运行打印导入与启动耗时，并记入运行指标（metrics.jsonl）。
+
+用法:
+    python cli.py check [--months 2023-03~2023-05] [--no-persist] [--force]
+    python cli.py refresh [--months ...]
+    python cli.py dry-run [--months ...] [--force]
+    python cli.py bench pipeline --scale 1
+    python cli.py check --daemon
+"""
+import time
+
+_STARTED = time.perf_counter()
+
+import os
+import sys
+import argparse
+
+
+def _github_pat():
+    github_pat = os.getenv("EXCEL_GITHUB_PAT")
+    if not github_pat:
+        raise ValueError("请设置 GITHUB_PAT 环境变量")
+    return github_pat
+
+
+def _import_pipeline():
+    """导入流水线（pandas/requests 等），返回模块与启动耗时"""
+    start = time.perf_counter()
+    import pipeline
+    ready = time.perf_counter()
+    startup = {'import': ready - start, 'startup': ready - _STARTED}
+    print(f"启动耗时 {startup['startup']:.3f}s（其中导入 {startup['import']:.3f}s）")
+    return pipeline, startup
+
+
+def _early_exit(force):
+    """不在发送窗口内时记录一轮跳过的运行并返回 True（只导入标准库模块）"""
+    if force:
+        return False
+    from time_window import report_window, early_exit_reason
+
+    reason = early_exit_reason(report_window())
+    if reason is None:
+        return False
+    import metrics
+
+    run = metrics.start_run('check')
+    run.record_stage('startup', time.perf_counter() - _STARTED)
+    run.add('early_exit')
+    print(f"⏭ 本轮无需发送，提前结束：{reason}")
+    metrics.finish_run()
+    return True
+
+
+def cmd_check(args):
+    if args.daemon:
+        # 常驻调度：按 SCHEDULE_CRON 定时核对，每轮都完整执行（不做提前结束判断）
+        from scheduler import SalaryCheckDaemon
+        SalaryCheckDaemon(_github_pat()).run()
+        return
+    github_pat = _github_pat()
+    if _early_exit(args.force):
+        return
+    pipeline, startup = _import_pipeline()
+    print("▶ 开始工资核对流程...")
+    stages = pipeline.CHECK_STAGES if args.no_persist else pipeline.CHECK_STAGES + ('persist',)
+    pipeline.SalaryPipeline(github_pat, args.months, job='check').run(stages, startup=startup)
+    print("✅ 工资核对流程结束。")
+
+
+def cmd_refresh(args):
+    github_pat = _github_pat()
+    pipeline, startup = _import_pipeline()
+    pipeline.SalaryPipeline(github_pat, args.months, job='refresh', include_emails=False).run(
+        pipeline.REFRESH_STAGES, startup=startup)
+    print("✅ 快照刷新结束。")
+
+
+def cmd_dry_run(args):
+    """执行到渲染为止，只列出将要发送的邮件，不发送、不写快照"""
+    github_pat = _github_pat()
+    if _early_exit(args.force):
+        return
+    pipeline, startup = _import_pipeline()
+    stages = ('fetch', 'merge', 'detect', 'classify', 'render')
+    result = pipeline.SalaryPipeline(github_pat, args.months, job='dry-run').run(stages, startup=startup)
+    outgoing = result.outgoing or []
+    print(f"预演结束：将发送 {len(outgoing)} 封邮件")
+    for mail in outgoing:
+        print(f" - {mail.subject.strip()} → {','.join(mail.to)}")
+
+
+def cmd_bench(args):
+    import benchmark
+    benchmark.main(args.bench_args)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="工资核对机器人")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    check = sub.add_parser('check', help='工资核对：发送报告并写出快照')
+    check.add_argument('--months', help='工资月份，如 2023-03~2023-05,2023-08（默认 SALARY_MONTHS / 上月）')
+    check.add_argument('--no-persist', action='store_true', help='不写出状态快照')
+    check.add_argument('--force', action='store_true', help='不在发送窗口内也完整执行')
+    check.add_argument('--daemon', action='store_true', help='常驻调度模式（SCHEDULE_CRON）')
+    check.set_defaults(func=cmd_check)
+
+    refresh = sub.add_parser('refresh', help='只刷新状态快照，不发送邮件（按变化通知时只写初始快照）')
+    refresh.add_argument('--months')
+    refresh.set_defaults(func=cmd_refresh)
+
+    dry_run = sub.add_parser('dry-run', help='预演：列出将要发送的邮件，不发送、不写快照')
+    dry_run.add_argument('--months')
+    dry_run.add_argument('--force', action='store_true', help='不在发送窗口内也完整执行')
+    dry_run.set_defaults(func=cmd_dry_run)
+
+    bench = sub.add_parser('bench', help='性能基准（参数同 benchmark.py）', add_help=False)
+    bench.add_argument('bench_args', nargs=argparse.REMAINDER)
+    bench.set_defaults(func=cmd_bench)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['bench']:
+        # 参数原样交给 benchmark.py（包括 --help 等以 - 开头的参数）
+        cmd_bench(argparse.Namespace(bench_args=argv[1:]))
+        return
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+本地替身服务：工资接口/GitHub contents API 的HTTP服务和SMTP收信端（基准测试使用，不对外发送任何数据）
+"""
+import gzip
+import base64
+import hashlib
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+XLSX_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class FakeUpstream:
+    """
+    本地HTTP服务，替代工资接口（POST /salary）和 GitHub contents API（GET /contents/<文件名>）
+
+    GitHub 文件支持 ETag / If-None-Match，返回 304 的行为与真实接口一致。
+    支持 HTTP/1.1 keep-alive（connections 统计建立的连接数）；fail_next=N 时接下来 N 个请求返回 503
+    （模拟接口抖动）；compress=True 时对声明支持 gzip 的请求压缩响应体。
+
+    用法:
+        with FakeUpstream() as upstream:
+            upstream.payroll = xlsx_bytes
+            upstream.files['邮箱维护.xlsx'] = xlsx_bytes
+            os.environ['SALARY_API_URL'] = upstream.salary_url
+            os.environ['GITHUB_CONTENTS_URL'] = upstream.contents_url
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.payroll = b''
+        self.files = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.connections = 0
+        self.fail_next = 0
+        self.compress = False
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def salary_url(self):
+        return self.base_url + '/salary'
+
+    @property
+    def contents_url(self):
+        return self.base_url + '/contents'
+
+    def _record(self, sent, not_modified=False):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+            self.not_modified += int(not_modified)
+
+    def _take_failure(self):
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def _make_handler(self):
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # 响应头和响应体分两次写出，keep-alive 连接上需关闭 Nagle 以免与延迟确认叠加出 40ms 停顿
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def handle(self):
+                with upstream._lock:
+                    upstream.connections += 1
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    # 客户端中止下载（如超过体积上限）
+                    pass
+
+            def _send(self, status, body=b'', headers=None):
+                if status == 200 and body and upstream.compress and \
+                        'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+                upstream._record(len(body), status == 304)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                self.rfile.read(length)
+                if self.path != '/salary':
+                    return self._send(404)
+                if upstream._take_failure():
+                    return self._send(503)
+                self._send(200, upstream.payroll, {'Content-Type': XLSX_TYPE})
+
+            def do_GET(self):
+                prefix = '/contents/'
+                name = unquote(self.path[len(prefix):]) if self.path.startswith(prefix) else None
+                body = upstream.files.get(name)
+                if body is None:
+                    return self._send(404)
+                if upstream._take_failure():
+                    return self._send(503)
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    return self._send(304, headers={'ETag': etag})
+                self._send(200, body, {'Content-Type': XLSX_TYPE, 'ETag': etag})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class SMTPSink:
+    """
+    本地SMTP收信端：接受任意登录和收件人，只统计不投递（明文SMTP，非465端口）
+
+    属性:
+        messages (int): 收到的邮件数
+        recipients (int): 收件人总数
+        sessions (int): 建立的会话数
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.messages = 0
+        self.recipients = 0
+        self.sessions = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def _make_handler(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.sessions += 1
+                self.reply('220 fake-smtp ready')
+                recipients = 0
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-fake-smtp')
+                        self.reply('250 AUTH PLAIN LOGIN')
+                    elif verb == 'AUTH':
+                        self._auth(command)
+                    elif verb == 'MAIL':
+                        recipients = 0
+                        self.reply('250 OK')
+                    elif verb == 'RCPT':
+                        recipients += 1
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        size = 0
+                        while True:
+                            data = self.rfile.readline()
+                            if not data or data in (b'.\r\n', b'.\n'):
+                                break
+                            size += len(data)
+                        with sink._lock:
+                            sink.messages += 1
+                            sink.recipients += recipients
+                            sink.bytes_received += size
+                        self.reply('250 OK queued')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    elif verb in ('HELO', 'RSET', 'NOOP'):
+                        self.reply('250 OK')
+                    else:
+                        self.reply('502 Command not implemented')
+
+            def _auth(self, command):
+                parts = command.split()
+                mechanism = parts[1].upper() if len(parts) > 1 else ''
+                if mechanism == 'PLAIN' and len(parts) < 3:
+                    self.reply('334 ')
+                    self.rfile.readline()
+                elif mechanism == 'LOGIN':
+                    self.reply('334 ' + base64.b64encode(b'Username:').decode())
+                    self.rfile.readline()
+                    self.reply('334 ' + base64.b64encode(b'Password:').decode())
+                    self.rfile.readline()
+                self.reply('235 Authentication successful')
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
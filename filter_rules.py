@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+项目组/基地等列的包含、排除规则
+
+规则从 JSON 文件读取（默认 filter_rules.json，可用 FILTER_RULES_PATH 指定），每轮运行编译一次：
+同一列的所有规则合并为一个匹配器（精确匹配用集合、前缀用 startswith 元组、包含用一个多选正则），
+每个不同的取值只判断一次，结果缓存后按行/按类别编码映射回数据。
+
+规则文件格式:
+    {"rules": [
+        {"column": "项目组", "action": "exclude", "match": "contains", "values": ["共享中心", "劳务派遣"]},
+        {"column": "基地", "action": "include", "match": "exact", "values": ["肇庆职场"]}
+    ]}
+
+- action: exclude（命中即剔除）或 include（该列有 include 规则时，只保留命中任一 include 规则的行）
+- match: exact（完全相等）、prefix（以其开头）、contains（包含）
+- 空值不命中任何规则：不会被 exclude 剔除，但在有 include 规则的列上会被剔除
+"""
+import os
+import re
+import json
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_RULES_PATH = 'filter_rules.json'
+MATCH_TYPES = ('exact', 'prefix', 'contains')
+ACTIONS = ('include', 'exclude')
+
+# 规则文件缺失时的默认规则（与原先写死在代码中的过滤条件一致）
+DEFAULT_RULES = [
+    {'column': '项目组', 'action': 'exclude', 'match': 'contains', 'values': ['共享中心', '劳务派遣', '招聘中台平台']},
+    {'column': '基地', 'action': 'exclude', 'match': 'contains', 'values': ['总部职能']},
+]
+
+
+class _Matcher:
+    """一组规则合并成的单个匹配器"""
+
+    def __init__(self):
+        self.exact = set()
+        self.prefixes = []
+        self.substrings = []
+        self._pattern = None
+
+    def add(self, match, values):
+        if match == 'exact':
+            self.exact.update(values)
+        elif match == 'prefix':
+            self.prefixes.extend(values)
+        else:
+            self.substrings.extend(values)
+
+    def compile(self):
+        self.prefixes = tuple(self.prefixes)
+        if self.substrings:
+            # 所有包含关键字合并为一个多选正则，一次扫描判断是否命中任一关键字
+            keys = sorted(set(self.substrings))
+            self._pattern = re.compile('|'.join(re.escape(key) for key in keys))
+        return self
+
+    def __bool__(self):
+        return bool(self.exact or self.prefixes or self.substrings)
+
+    def __call__(self, text):
+        return (text in self.exact or
+                (bool(self.prefixes) and text.startswith(self.prefixes)) or
+                (self._pattern is not None and self._pattern.search(text) is not None))
+
+    def match_many(self, texts):
+        """对一批（已去重的）字符串向量化判断，返回布尔数组"""
+        texts = pd.Index(texts, dtype=object).astype(str)
+        hit = np.zeros(len(texts), dtype=bool)
+        if self.exact:
+            hit |= texts.isin(self.exact)
+        if self.prefixes:
+            hit |= np.asarray(texts.str.startswith(self.prefixes), dtype=bool)
+        if self._pattern is not None:
+            hit |= np.asarray(texts.str.contains(self._pattern), dtype=bool)
+        return hit
+
+
+class _ColumnFilter:
+    """单列的编译结果：取值 -> 是否保留（带缓存，每个不同取值只判断一次）"""
+
+    def __init__(self, column):
+        self.column = column
+        self.include = _Matcher()
+        self.exclude = _Matcher()
+        self._cache = {}
+
+    def keep(self, value):
+        result = self._cache.get(value)
+        if result is None:
+            if value is None or (not isinstance(value, str) and pd.isna(value)):
+                result = not self.include
+            else:
+                text = str(value)
+                result = (not self.include or self.include(text)) and not self.exclude(text)
+            self._cache[value] = result
+        return result
+
+    def mask(self, series):
+        """整列的保留掩码：只对不同取值判断，再按编码映射回各行"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            categories = series.cat.categories
+        else:
+            codes, categories = pd.factorize(series)
+        # 只对不同取值向量化判断；末尾一项对应空值（编码 -1）
+        keep = np.ones(len(categories), dtype=bool)
+        if self.include:
+            keep &= self.include.match_many(categories)
+        if self.exclude:
+            keep &= ~self.exclude.match_many(categories)
+        lookup = np.append(keep, self.keep(None))
+        return lookup[codes]
+
+
+class FilterRules:
+    """
+    编译后的过滤规则
+
+    参数:
+        rules (list[dict]): 规则列表（格式见模块说明）
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.columns = {}
+        for i, rule in enumerate(self.rules):
+            column, action, match = rule.get('column'), rule.get('action', 'exclude'), rule.get('match', 'contains')
+            values = rule.get('values') or []
+            if isinstance(values, str):
+                values = [values]
+            if not column or action not in ACTIONS or match not in MATCH_TYPES:
+                raise ValueError(f"第 {i + 1} 条过滤规则无效: {rule}")
+            column_filter = self.columns.setdefault(column, _ColumnFilter(column))
+            getattr(column_filter, action).add(match, [str(value) for value in values])
+        for column_filter in self.columns.values():
+            column_filter.include.compile()
+            column_filter.exclude.compile()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def row_filter(self, header):
+        """
+        为逐行读取生成判断函数
+
+        参数:
+            header (list): 表头（规则中不在表头里的列忽略）
+
+        返回:
+            callable: row(tuple) -> bool，True 表示保留
+        """
+        checks = [(header.index(column), column_filter.keep)
+                  for column, column_filter in self.columns.items() if column in header]
+
+        def keep(row):
+            for idx, keep_value in checks:
+                if not keep_value(row[idx] if idx < len(row) else None):
+                    return False
+            return True
+
+        return keep
+
+    def mask(self, df):
+        """DataFrame 的保留掩码（规则中不在 df 里的列忽略）"""
+        keep = np.ones(len(df), dtype=bool)
+        for column, column_filter in self.columns.items():
+            if column in df.columns:
+                keep &= column_filter.mask(df[column])
+        return keep
+
+    def apply(self, df):
+        """返回按规则过滤后的数据（没有被剔除的行时原样返回）"""
+        keep = self.mask(df)
+        if keep.all():
+            return df
+        return df[keep].reset_index(drop=True)
+
+
+_loaded = {}
+
+
+def load_filter_rules(path=None):
+    """
+    读取并编译过滤规则（同一文件未修改时复用上次的编译结果）
+
+    参数:
+        path (str): 规则文件路径，默认读取 FILTER_RULES_PATH（filter_rules.json）；文件不存在时使用默认规则
+
+    返回:
+        FilterRules: 编译后的规则
+    """
+    path = path or os.getenv("FILTER_RULES_PATH") or DEFAULT_RULES_PATH
+    if not os.path.exists(path):
+        key = (path, None)
+        if key not in _loaded:
+            print(f"未找到过滤规则文件 {path}，使用默认规则")
+            _loaded[key] = FilterRules(DEFAULT_RULES)
+        return _loaded[key]
+
+    key = (path, os.path.getmtime(path))
+    rules = _loaded.get(key)
+    if rules is None:
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        rules = _loaded[key] = FilterRules(payload['rules'] if isinstance(payload, dict) else payload)
+    return rules
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+import time
+import shutil
+import hashlib
+
+import pandas as pd
+
+import metrics
+from http_client import default_client
+
+
+# 缓存目录与有效期（秒），可通过环境变量覆盖
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'github')
+DEFAULT_TTL = 3600
+
+
+class GitHubExcelCache:
+    """
+    GitHub Excel 文件的本地条件缓存
+
+    每个文件保存三份内容：原始字节(.xlsx)、解析后的DataFrame(.pkl)、响应元数据(.json，含ETag/Last-Modified)。
+    - 在有效期内直接返回缓存，不发请求
+    - 超过有效期后带 If-None-Match/If-Modified-Since 发条件请求，304 时跳过下载和解析
+    - invalidate=True（或环境变量 GITHUB_CACHE_REFRESH=1）时忽略缓存强制重新下载
+
+    参数:
+        cache_dir (str): 缓存目录，默认读取 GITHUB_CACHE_DIR
+        ttl (float): 缓存有效期（秒），默认读取 GITHUB_CACHE_TTL
+        invalidate (bool): 是否强制失效
+        session (HttpClient): HTTP客户端（常驻调度时跨轮保持连接），默认使用进程内共享的客户端
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, invalidate=None, session=None):
+        self.cache_dir = cache_dir or os.getenv("GITHUB_CACHE_DIR") or DEFAULT_CACHE_DIR
+        self.ttl = float(ttl if ttl is not None else os.getenv("GITHUB_CACHE_TTL") or DEFAULT_TTL)
+        if invalidate is None:
+            invalidate = os.getenv("GITHUB_CACHE_REFRESH", '') in ('1', 'true', 'yes')
+        self.invalidate = invalidate
+        self.session = session or default_client()
+
+    def _paths(self, url, sheet_name):
+        key = hashlib.sha1(f"{url}#{sheet_name}".encode('utf-8')).hexdigest()[:16]
+        base = os.path.join(self.cache_dir, key)
+        return base + '.json', base + '.xlsx', base + '.pkl'
+
+    def _load(self, url, sheet_name):
+        meta_path, _, frame_path = self._paths(url, sheet_name)
+        if not (os.path.exists(meta_path) and os.path.exists(frame_path)):
+            return None, None
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            return meta, pd.read_pickle(frame_path)
+        except Exception as e:
+            print(f"读取GitHub缓存失败，将重新下载: {str(e)}")
+            return None, None
+
+    def _store(self, url, sheet_name, meta, content, df):
+        meta_path, raw_path, frame_path = self._paths(url, sheet_name)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if content is not None:
+            content.seek(0)
+            with open(raw_path, 'wb') as f:
+                shutil.copyfileobj(content, f)
+        if df is not None:
+            df.to_pickle(frame_path)
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def clear(self):
+        """删除全部缓存文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(('.json', '.xlsx', '.pkl')):
+                os.remove(os.path.join(self.cache_dir, name))
+
+    def fetch_excel(self, url, headers, sheet_name="Sheet1"):
+        """
+        获取Excel并解析为DataFrame，优先使用缓存
+
+        参数:
+            url (str): GitHub contents API 地址
+            headers (dict): 请求头（含认证信息）
+            sheet_name (str): 工作表名称
+
+        返回:
+            pd.DataFrame: 解析后的数据（请求失败时抛出异常）
+        """
+        meta, cached_df = (None, None) if self.invalidate else self._load(url, sheet_name)
+        now = time.time()
+        if meta is not None and now - meta.get('checked_at', 0) < self.ttl:
+            metrics.current().add('github_cache_hits')
+            return cached_df
+
+        request_headers = dict(headers)
+        if meta is not None:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        download = self.session.get(url, name='github', headers=request_headers)
+        with download.body as body:
+            if download.status_code == 304 and meta is not None:
+                # 文件未变化：只刷新检查时间，跳过下载和解析
+                meta['checked_at'] = now
+                self._store(url, sheet_name, meta, None, None)
+                metrics.current().add('github_not_modified')
+                return cached_df
+
+            df = pd.read_excel(body, sheet_name=sheet_name)
+            meta = {
+                'url': url,
+                'etag': download.headers.get('ETag'),
+                'last_modified': download.headers.get('Last-Modified'),
+                'checked_at': now,
+            }
+            self._store(url, sheet_name, meta, body, df)
+        return df
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP客户端：连接池复用、失败重试（指数退避）、gzip、流式下载到临时缓冲、体积上限、请求耗时统计
+
+工资接口和 GitHub 文件下载都通过同一个客户端：
+- 同一主机的请求复用 keep-alive 连接（并发拉取多个数据源/多个月份时共用连接池）
+- 连接失败、超时、下载中断和 429/5xx 按指数退避重试（有 Retry-After 时按其等待），重试次数可配置
+- 响应体分块读入 SpooledTemporaryFile：小文件留在内存，超过 HTTP_SPOOL_BYTES 转存磁盘；
+  超过 HTTP_MAX_BYTES 时中止下载
+- 每个请求的首字节耗时、总耗时、重试次数、字节数记入运行指标（http:<名称> 阶段），并按名称汇总分位数
+"""
+import os
+import time
+import random
+import tempfile
+import threading
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_SPOOL_BYTES = 8 * 1024 * 1024
+DEFAULT_POOL_SIZE = 10
+CHUNK_SIZE = 64 * 1024
+
+# 可重试的状态码（限流、网关/服务暂时不可用）
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# 可重试的异常（连接失败、超时、下载中断）
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+class ResponseTooLarge(Exception):
+    """响应体超过体积上限"""
+
+
+# 单次请求的结果：状态码、响应头、响应体（已回到开头的临时文件，304 等无内容时为空文件）、字节数
+Download = namedtuple('Download', ['status_code', 'headers', 'body', 'size'])
+
+
+def _env_float(name, default):
+    return float(os.getenv(name) or default)
+
+
+class HttpClient:
+    """
+    带重试和流式下载的HTTP客户端（线程安全，可在并发拉取中共用）
+
+    参数:
+        retries (int): 失败后的最多重试次数，默认读取 HTTP_RETRIES（3）
+        backoff (float): 首次重试前的等待秒数，之后每次翻倍，默认读取 HTTP_BACKOFF（0.5）
+        timeout (tuple): (连接超时, 读取超时) 秒，默认读取 HTTP_CONNECT_TIMEOUT（5）/ HTTP_READ_TIMEOUT（30）
+        max_bytes (int): 单个响应体的上限，默认读取 HTTP_MAX_BYTES（64MB）
+        spool_bytes (int): 响应体超过该大小时转存磁盘，默认读取 HTTP_SPOOL_BYTES（8MB）
+        pool_size (int): 每个主机的连接池大小，默认读取 HTTP_POOL_SIZE（10）
+
+    用法:
+        client = HttpClient()
+        with client.request('POST', url, name='salary', json=payload).body as body:
+            df = read_salary_workbook(body)
+    """
+
+    def __init__(self, retries=None, backoff=None, timeout=None, max_bytes=None, spool_bytes=None, pool_size=None):
+        self.retries = int(retries if retries is not None else os.getenv("HTTP_RETRIES") or DEFAULT_RETRIES)
+        self.backoff = float(backoff if backoff is not None else _env_float("HTTP_BACKOFF", DEFAULT_BACKOFF))
+        self.timeout = timeout or (_env_float("HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+                                   _env_float("HTTP_READ_TIMEOUT", DEFAULT_READ_TIMEOUT))
+        self.max_bytes = int(max_bytes or os.getenv("HTTP_MAX_BYTES") or DEFAULT_MAX_BYTES)
+        self.spool_bytes = int(spool_bytes or os.getenv("HTTP_SPOOL_BYTES") or DEFAULT_SPOOL_BYTES)
+        pool_size = int(pool_size or os.getenv("HTTP_POOL_SIZE") or DEFAULT_POOL_SIZE)
+
+        self.session = requests.Session()
+        # 重试由 request() 自己处理（需要覆盖下载中断并逐次记录），适配器不再重试
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self._lock = threading.Lock()
+        self.latencies = {}
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _wait(self, attempt, response=None):
+        """第 attempt 次失败后的等待秒数：优先 Retry-After，否则指数退避加随机抖动"""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), DEFAULT_MAX_BACKOFF)
+        return min(self.backoff * 2 ** (attempt - 1), DEFAULT_MAX_BACKOFF) * random.uniform(0.8, 1.2)
+
+    def _read_body(self, response):
+        """把响应体分块读入临时缓冲（gzip 等已解码），超过上限时中止"""
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            raise ResponseTooLarge(f"响应体 {int(length)} 字节，超过上限 {self.max_bytes} 字节")
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        size = 0
+        try:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise ResponseTooLarge(f"响应体超过上限 {self.max_bytes} 字节")
+                body.write(chunk)
+        except BaseException:
+            body.close()
+            raise
+        body.seek(0)
+        return body, size
+
+    def request(self, method, url, name=None, **kwargs):
+        """
+        发送请求并流式读取响应体，失败时按退避重试
+
+        参数:
+            method (str): 'GET'/'POST'
+            url (str): 地址
+            name (str): 统计用名称（如 salary、github），默认取请求方法
+            **kwargs: 传给 requests 的参数（headers、json 等；timeout 默认用客户端配置）
+
+        返回:
+            Download: 响应结果（调用方负责关闭 body）；重试用尽后非 2xx/3xx 状态抛出 HTTPError，
+                      网络异常抛出最后一次的异常
+        """
+        name = name or method.lower()
+        kwargs.setdefault('timeout', self.timeout)
+        run = metrics.current()
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            response = None
+            try:
+                response = self.session.request(method, url, stream=True, **kwargs)
+                first_byte = time.perf_counter() - start
+                if response.status_code in RETRY_STATUSES and attempt <= self.retries:
+                    raise requests.HTTPError(f"{response.status_code} {response.reason}", response=response)
+                response.raise_for_status()
+                body, size = self._read_body(response)
+                break
+            except RETRY_ERRORS + (requests.HTTPError,) as e:
+                retryable = isinstance(e, RETRY_ERRORS) or (
+                    e.response is not None and e.response.status_code in RETRY_STATUSES)
+                if not retryable or attempt > self.retries:
+                    self._record(run, name, time.perf_counter() - start, attempt, 0, error=str(e))
+                    raise
+                wait = self._wait(attempt, response)
+                run.add('http_retries')
+                print(f"请求 {name} 失败（第 {attempt} 次）：{str(e)}，{wait:.1f}s 后重试")
+                time.sleep(wait)
+            finally:
+                if response is not None:
+                    response.close()
+
+        self._record(run, name, time.perf_counter() - start, attempt, size,
+                     status=response.status_code, first_byte=round(first_byte, 4))
+        return Download(response.status_code, response.headers, body, size)
+
+    def get(self, url, name=None, **kwargs):
+        return self.request('GET', url, name=name, **kwargs)
+
+    def post(self, url, name=None, **kwargs):
+        return self.request('POST', url, name=name, **kwargs)
+
+    def _record(self, run, name, seconds, attempts, size, **fields):
+        run.record_stage(f'http:{name}', seconds, attempts=attempts, bytes=size, **fields)
+        run.add('bytes_downloaded', size)
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def latency_summary(self):
+        """
+        按名称汇总请求耗时
+
+        返回:
+            dict: 名称 -> {'count', 'p50', 'p95', 'max'}（秒，含重试等待）
+        """
+        summary = {}
+        with self._lock:
+            items = {name: sorted(values) for name, values in self.latencies.items()}
+        for name, values in items.items():
+            summary[name] = {
+                'count': len(values),
+                'p50': round(values[(len(values) - 1) // 2], 4),
+                'p95': round(values[min(len(values) - 1, int(len(values) * 0.95))], 4),
+                'max': round(values[-1], 4),
+            }
+        return summary
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """进程内共享的客户端（按环境变量配置，首次使用时创建）"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
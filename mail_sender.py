@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import queue
+import smtplib
+import threading
+import email.utils
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+
+
+# 单封邮件的发送结果：收件人列表、主题、是否成功、失败原因
+SendResult = namedtuple('SendResult', ['to', 'subject', 'ok', 'error'])
+# 预先渲染好的待发邮件：收件人、主题、HTML内容、报告内容摘要（可选，发件箱去重用）
+OutgoingMail = namedtuple('OutgoingMail', ['to', 'subject', 'html', 'digest'], defaults=[None])
+
+DEFAULT_SMTP_SERVER = 'smtp.qiye.aliyun.com'
+DEFAULT_SMTP_PORT = 465
+# 连接池中会话的最长空闲秒数（低于服务器常见的 5 分钟空闲断开）
+DEFAULT_IDLE_TIMEOUT = 240
+
+
+def _should_reconnect(error):
+    """判断异常是否为会话中断（断开连接、网络错误或421服务不可用），可重连重试"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    # smtplib 的其他异常（如收件人被拒）重连也无济于事
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def normalize_recipients(to_email):
+    """
+    统一收件人格式为列表（支持字符串、逗号分隔字符串或列表）
+    """
+    if isinstance(to_email, str):
+        items = to_email.split(',')
+    else:
+        items = list(to_email)
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def build_message(sender, to_email, content_table, subject='工资核对提醒', reply_to=''):
+    """
+    构建HTML邮件
+
+    参数:
+        sender (str): 发件人邮箱
+        to_email (str/list): 收件人邮箱
+        content_table (str): HTML内容
+        subject (str): 邮件主题
+        reply_to (str): 回信地址
+
+    返回:
+        MIMEMultipart: 构建好的邮件对象
+    """
+    msg = MIMEMultipart('alternative')
+    msg['From'] = formataddr(['工资核对提醒', sender])
+    msg['Reply-to'] = reply_to
+    msg['To'] = ','.join(normalize_recipients(to_email))
+    msg['Subject'] = subject
+    msg['Message-id'] = email.utils.make_msgid()
+    msg['Date'] = email.utils.formatdate()
+    msg.attach(MIMEText(content_table, _subtype='html', _charset='UTF-8'))
+    return msg
+
+
+class SMTPMailer:
+    """
+    持久化SMTP发送器：整轮运行只登录一次并复用连接
+
+    - 服务器断开会话时自动重连并重试当前邮件
+    - 单个会话达到邮件数/收件人数上限后主动断开，下次发送时重新登录
+    - 每封邮件的结果以 SendResult 返回，并累计在 results 中供调用方汇总
+
+    用法:
+        with SMTPMailer() as mailer:
+            mailer.send('a@example.com', html, subject='工资核对提醒')
+    """
+
+    def __init__(self, username=None, password=None, host=None, port=None,
+                 max_messages_per_session=50, max_recipients_per_session=200,
+                 timeout=10, max_retries=1):
+        self.username = username or os.getenv("SMTP_USER")
+        self.password = password or os.getenv("SMTP_PASS")
+        self.host = host or os.getenv("SMTP_SERVER") or DEFAULT_SMTP_SERVER
+        self.port = int(port or os.getenv("SMTP_PORT") or DEFAULT_SMTP_PORT)
+        self.reply_to = os.getenv("REPLY_TO", '')
+        self.max_messages_per_session = max_messages_per_session
+        self.max_recipients_per_session = max_recipients_per_session
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+        self.client = None
+        self.session_messages = 0
+        self.session_recipients = 0
+        self.sessions_opened = 0
+        self.results = []
+
+    # region 连接管理
+    def _open(self):
+        """建立连接并登录（465端口走SSL，失败时回退到25端口普通连接）"""
+        try:
+            if self.port == 465:
+                client = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+                print('SMTP_SSL连接成功')
+            else:
+                client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+                print('SMTP连接成功')
+        except Exception:
+            if self.port == 25:
+                raise
+            client = smtplib.SMTP(self.host, 25, timeout=self.timeout)
+            print('SMTP连接成功')
+
+        if self.username:
+            client.login(self.username, self.password)
+            print('登录成功')
+        self.client = client
+        self.session_messages = 0
+        self.session_recipients = 0
+        self.sessions_opened += 1
+
+    def close(self):
+        """退出当前会话（忽略已断开的连接）"""
+        if self.client is None:
+            return
+        try:
+            self.client.quit()
+        except Exception:
+            pass
+        finally:
+            self.client = None
+
+    def _ensure_session(self, recipient_count):
+        """按会话上限决定是否需要重新登录"""
+        if self.client is not None and (
+                self.session_messages >= self.max_messages_per_session or
+                self.session_recipients + recipient_count > self.max_recipients_per_session):
+            self.close()
+        if self.client is None:
+            self._open()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    # endregion
+
+    def send_message(self, msg, recipients):
+        """
+        发送已构建好的邮件，连接中断时自动重连重试
+
+        返回:
+            SendResult: 发送结果
+        """
+        subject = msg['Subject']
+        attempt = 0
+        while True:
+            try:
+                self._ensure_session(len(recipients))
+                self.client.sendmail(self.username, recipients, msg.as_string())
+                self.session_messages += 1
+                self.session_recipients += len(recipients)
+                print('邮件发送成功')
+                result = SendResult(recipients, subject, True, None)
+                break
+            except Exception as e:
+                if not _should_reconnect(e) or attempt >= self.max_retries:
+                    print('邮件发送失败:', str(e))
+                    result = SendResult(recipients, subject, False, str(e))
+                    break
+                self.close()
+                attempt += 1
+                print(f'SMTP连接中断，正在重连（第{attempt}次）:', str(e))
+        self.results.append(result)
+        return result
+
+    def send(self, to_email, content_table, subject='工资核对提醒'):
+        """
+        发送HTML邮件
+
+        参数:
+            to_email (str/list): 收件人邮箱
+            content_table (str): HTML内容
+            subject (str): 邮件主题
+
+        返回:
+            SendResult: 发送结果
+        """
+        recipients = normalize_recipients(to_email)
+        try:
+            msg = build_message(self.username, recipients, content_table, subject, self.reply_to)
+        except Exception as e:
+            print('邮件构建失败:', str(e))
+            result = SendResult(recipients, subject, False, str(e))
+            self.results.append(result)
+            return result
+        return self.send_message(msg, recipients)
+
+    def send_all(self, outgoing):
+        """
+        按顺序发送一批预渲染邮件
+
+        参数:
+            outgoing (list[OutgoingMail]): 待发邮件
+
+        返回:
+            list[SendResult]: 与 outgoing 一一对应的发送结果
+        """
+        return [self.send(mail.to, mail.html, mail.subject) for mail in outgoing]
+
+    def summary(self):
+        """返回本轮发送的成功/失败统计"""
+        return _summarize(self.results, self.sessions_opened)
+
+
+def _summarize(results, sessions):
+    sent = sum(1 for r in results if r.ok)
+    return {
+        'sent': sent,
+        'failed': len(results) - sent,
+        'sessions': sessions,
+        'failures': [r for r in results if not r.ok],
+    }
+
+
+class RateLimiter:
+    """
+    按主机限速：同一SMTP主机两次发送之间至少间隔 1/rate_per_second 秒（线程安全）
+    """
+
+    def __init__(self, rate_per_second):
+        self.interval = 1.0 / rate_per_second if rate_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(host, rate_per_second):
+    """同一进程内同一主机共享一个限速器"""
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = _host_limiters[host] = RateLimiter(rate_per_second)
+        return limiter
+
+
+class MailerPool:
+    """
+    有界并发发送池：最多 max_workers 个 SMTPMailer 持久连接，工作线程发送时从空闲队列取出、
+    发完放回，连接不随线程或批次关闭；所有线程共用按主机的限速器，避免触发阿里云企业邮的频率限制
+
+    - 同一轮内发件箱的多次重试、常驻调度间隔较短的相邻几轮都复用已登录的会话
+    - 会话空闲超过 idle_timeout 后关闭（下次取用时重新登录）：SMTP 服务器一般在空闲约 5 分钟后
+      主动断开，按默认每半小时一轮调度时，各轮之间不会复用会话
+    - close() 关闭全部会话（进程退出或单次运行结束时调用）
+
+    参数:
+        max_workers (int): 并发连接数上限，默认读取 SMTP_MAX_WORKERS（4）
+        rate_per_second (float): 每个主机每秒最多发送的邮件数，默认读取 SMTP_RATE_LIMIT（5）
+        idle_timeout (float): 会话最长空闲秒数，默认读取 SMTP_IDLE_TIMEOUT（240）
+        **mailer_kwargs: 透传给每个 SMTPMailer 的参数
+    """
+
+    def __init__(self, max_workers=None, rate_per_second=None, idle_timeout=None, **mailer_kwargs):
+        self.max_workers = int(max_workers or os.getenv("SMTP_MAX_WORKERS") or 4)
+        rate = rate_per_second if rate_per_second is not None else float(os.getenv("SMTP_RATE_LIMIT") or 5)
+        self.idle_timeout = float(idle_timeout if idle_timeout is not None else
+                                  os.getenv("SMTP_IDLE_TIMEOUT") or DEFAULT_IDLE_TIMEOUT)
+        self.mailer_kwargs = mailer_kwargs
+        self.host = SMTPMailer(**mailer_kwargs).host
+        self.limiter = get_host_limiter(self.host, rate)
+        self.results = []
+        # 空闲的发送器（后进先出：优先取用刚用过、会话仍在的那个）及其放回时间
+        self._idle = queue.LifoQueue()
+        self._mailers = []
+        self._lock = threading.Lock()
+
+    def _checkout(self):
+        """取出一个空闲发送器；都在使用中且未达上限时新建，否则等待归还"""
+        try:
+            mailer, released = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if len(self._mailers) < self.max_workers:
+                    mailer = SMTPMailer(**self.mailer_kwargs)
+                    self._mailers.append(mailer)
+                    return mailer
+            mailer, released = self._idle.get()
+        if time.monotonic() - released > self.idle_timeout:
+            mailer.close()
+        return mailer
+
+    def _checkin(self, mailer):
+        self._idle.put((mailer, time.monotonic()))
+
+    def _send_one(self, mail):
+        self.limiter.acquire()
+        mailer = self._checkout()
+        try:
+            return mailer.send(mail.to, mail.html, mail.subject)
+        finally:
+            self._checkin(mailer)
+
+    def send_all(self, outgoing):
+        """
+        并发发送一批预渲染邮件（发送后会话保持，供下一批复用）
+
+        参数:
+            outgoing (list[OutgoingMail]): 待发邮件
+
+        返回:
+            list[SendResult]: 与 outgoing 一一对应的发送结果
+        """
+        if not outgoing:
+            return []
+        workers = min(self.max_workers, len(outgoing))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='smtp') as executor:
+            results = list(executor.map(self._send_one, outgoing))
+        with self._lock:
+            self.results.extend(results)
+        return results
+
+    def close_idle(self):
+        """关闭空闲超过 idle_timeout 的会话（常驻调度在等待下一轮时定期调用）"""
+        now = time.monotonic()
+        idle = []
+        while True:
+            try:
+                idle.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for mailer, released in idle:
+            if now - released > self.idle_timeout:
+                mailer.close()
+        # 按放回时间从早到晚放回，保持后进先出的顺序
+        for item in reversed(idle):
+            self._idle.put(item)
+
+    def close(self):
+        """关闭全部会话（发送器保留，之后再发送时重新登录）"""
+        with self._lock:
+            for mailer in self._mailers:
+                mailer.close()
+
+    def reset(self):
+        """清空累计的发送结果和会话计数（常驻调度中每轮结束后调用），不关闭连接"""
+        with self._lock:
+            self.results = []
+            for mailer in self._mailers:
+                mailer.results = []
+                mailer.sessions_opened = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def summary(self):
+        """返回本轮发送的成功/失败统计"""
+        with self._lock:
+            sessions = sum(m.sessions_opened for m in self._mailers)
+        return _summarize(self.results, sessions)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+流程埋点：记录每个阶段的耗时、行数、下载字节数、邮件发送成功/失败数
+
+每轮运行结束时追加写出 JSON Lines（每个阶段一行 + 一行汇总）并打印可读表格。
+只用 perf_counter 和字典累加，开销可以忽略，生产环境常开。
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from time_window import beijing_now
+
+DEFAULT_METRICS_PATH = 'metrics.jsonl'
+
+
+class RunMetrics:
+    """
+    单轮运行的指标
+
+    用法:
+        run = start_run('check')
+        with run.stage('fetch') as stage:
+            ...
+            stage['rows'] = len(df)
+        run.add('bytes_downloaded', len(content))
+        finish_run()
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.run_id = beijing_now().strftime('%Y%m%dT%H%M%S')
+        self.stages = []
+        self.counters = {}
+        self._started = time.perf_counter()
+        self.seconds = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """计时一个阶段；yield 出的字典可补充 rows 等字段"""
+        record = {'stage': name}
+        record.update(fields)
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record['error'] = str(e)
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.stages.append(record)
+
+    def record_stage(self, name, seconds, **fields):
+        """记录已在别处计时的阶段（如并发拉取中每个数据源的耗时）"""
+        record = {'stage': name, 'seconds': round(seconds, 4)}
+        record.update(fields)
+        with self._lock:
+            self.stages.append(record)
+
+    def add(self, name, value=1):
+        """累加计数器（线程安全）"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        """固定本轮总耗时"""
+        if self.seconds is None:
+            self.seconds = round(time.perf_counter() - self._started, 4)
+        return self
+
+    def summary(self):
+        seconds = self.seconds if self.seconds is not None else round(time.perf_counter() - self._started, 4)
+        return {
+            'job': self.job,
+            'run_id': self.run_id,
+            'stage': 'total',
+            'seconds': seconds,
+            **self.counters,
+        }
+
+    def write_jsonl(self, path=None):
+        """追加写出本轮的阶段记录和汇总（JSON Lines）"""
+        path = path or os.getenv("METRICS_PATH") or DEFAULT_METRICS_PATH
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.stages:
+                line = {'job': self.job, 'run_id': self.run_id}
+                line.update(record)
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+            f.write(json.dumps(self.summary(), ensure_ascii=False) + '\n')
+        return path
+
+    def format_table(self):
+        """可读的阶段耗时表"""
+        lines = [f"运行指标（{self.job} {self.run_id}）",
+                 f"{'阶段':<22}{'耗时(s)':>10}  详情"]
+        for record in self.stages:
+            details = '，'.join(f"{key}={value}" for key, value in record.items()
+                               if key not in ('stage', 'seconds'))
+            lines.append(f"{record['stage']:<22}{record['seconds']:>10.3f}  {details}")
+        summary = self.summary()
+        lines.append(f"{'总计':<22}{summary['seconds']:>10.3f}  " +
+                     '，'.join(f"{key}={value}" for key, value in self.counters.items()))
+        return '\n'.join(lines)
+
+
+_current = None
+# 最近一次结束的运行（供基准脚本读取）
+last_run = None
+
+
+def start_run(job):
+    """开始一轮运行的指标记录"""
+    global _current
+    _current = RunMetrics(job)
+    return _current
+
+
+def current():
+    """当前运行的指标；未调用 start_run 时返回一个用完即弃的对象，埋点代码无需判断"""
+    return _current or RunMetrics('untracked')
+
+
+def finish_run(path=None, print_table=True):
+    """
+    结束当前运行：写出 JSON Lines 并打印表格
+
+    返回:
+        RunMetrics: 刚结束的运行（未开始时返回 None）
+    """
+    global _current, last_run
+    run = _current
+    if run is None:
+        return None
+    _current = None
+    last_run = run.finish()
+    try:
+        run.write_jsonl(path)
+    except Exception as e:
+        print(f"写出运行指标失败: {str(e)}")
+    if print_table:
+        print(run.format_table())
+    return run
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+持久化发件箱：渲染好的邮件先写入 SQLite，再由发送端按指数退避逐批投递
+
+幂等键为（收件人, 报告摘要, 运行时段）：同一时段内重新运行流程时，内容相同且已投递的邮件
+直接跳过；上次运行中断或SMTP故障留下的未投递邮件在下次运行时继续发送。
+新时段写入的邮件会取代更早时段发给同一收件人、同一主题且仍未投递的邮件（标记为 superseded），
+同一份报告不会因为跨时段重新渲染而投递两次。
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+
+from mail_sender import OutgoingMail
+from time_window import beijing_now
+
+
+DEFAULT_OUTBOX_PATH = os.path.join('.cache', 'outbox', 'outbox.sqlite3')
+
+PENDING = 'pending'
+SENT = 'sent'
+FAILED = 'failed'
+EXPIRED = 'expired'
+SUPERSEDED = 'superseded'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    recipients TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    run_slot TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+
+def run_slot(now=None):
+    """运行时段：北京时间精确到小时，同一小时内的重跑视为同一轮"""
+    now = now or beijing_now()
+    return now.strftime('%Y-%m-%d %H')
+
+
+def report_digest(mail):
+    """报告摘要：主题+报告内容的SHA-1（渲染器给出的内容摘要不含页脚生成时间，重跑时保持不变）"""
+    content = mail.digest or mail.html
+    return hashlib.sha1((mail.subject + '\n' + content).encode('utf-8')).hexdigest()
+
+
+def message_key(recipients, digest, slot):
+    """幂等键：收件人（排序去重）、报告摘要、运行时段"""
+    to = ','.join(sorted(set(recipients)))
+    return hashlib.sha1(f'{to}|{digest}|{slot}'.encode('utf-8')).hexdigest()
+
+
+class Outbox:
+    """
+    SQLite 发件箱
+
+    参数:
+        path (str): 数据库路径，默认读取 OUTBOX_PATH（.cache/outbox/outbox.sqlite3）
+        max_attempts (int): 单封邮件最多尝试次数，超过后标记为失败
+        base_delay (float): 首次重试前的等待秒数，之后每次翻倍
+        max_delay (float): 单次退避的上限秒数
+        max_age (float): 未投递邮件的有效期（小时），过期不再发送，默认读取 OUTBOX_MAX_AGE_HOURS（12）
+
+    用法:
+        outbox = Outbox()
+        outbox.enqueue(outgoing, run_slot(now))
+        outbox.drain(mailer)
+    """
+
+    def __init__(self, path=None, max_attempts=5, base_delay=2.0, max_delay=60.0, max_age=None):
+        self.path = path or os.getenv("OUTBOX_PATH") or DEFAULT_OUTBOX_PATH
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_age = float(max_age if max_age is not None else os.getenv("OUTBOX_MAX_AGE_HOURS") or 12)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def enqueue(self, outgoing, slot):
+        """
+        写入待发邮件，幂等键已存在的邮件（无论是否已投递）直接跳过；
+        更早时段发给同一收件人、同一主题且仍未投递的邮件由新邮件取代，不再发送
+
+        参数:
+            outgoing (list[OutgoingMail]): 渲染好的邮件（digest 为空时按完整HTML计算摘要）
+            slot (str): 运行时段（run_slot 的结果）
+
+        返回:
+            int: 新写入的邮件数
+        """
+        now = time.time()
+        rows = []
+        for mail in outgoing:
+            recipients = sorted(set(mail.to))
+            digest = report_digest(mail)
+            rows.append((message_key(recipients, digest, slot), json.dumps(recipients), mail.subject,
+                         mail.html, digest, slot, PENDING, now, now))
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE outbox SET status = ? WHERE status = ? AND recipients = ? AND subject = ? AND run_slot != ?",
+                [(SUPERSEDED, PENDING, row[1], row[2], slot) for row in rows])
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO outbox (key, recipients, subject, html, digest, run_slot, status, "
+                "next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            return self.conn.total_changes - before
+
+    def _expire(self, now):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE outbox SET status = ? WHERE status = ? AND created_at < ?",
+                (EXPIRED, PENDING, now - self.max_age * 3600))
+
+    def _due(self, now):
+        cursor = self.conn.execute(
+            "SELECT key, recipients, subject, html, attempts FROM outbox "
+            "WHERE status = ? AND next_attempt_at <= ? ORDER BY created_at",
+            (PENDING, now))
+        return cursor.fetchall()
+
+    def _next_due_at(self):
+        row = self.conn.execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)).fetchone()
+        return row[0]
+
+    def _backoff(self, attempts):
+        """第 attempts 次失败后的等待时间：指数退避加随机抖动"""
+        delay = min(self.base_delay * 2 ** (attempts - 1), self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _record(self, key, attempts, result, now):
+        if result.ok:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = NULL, sent_at = ? WHERE key = ?",
+                (SENT, attempts, now, key))
+        elif attempts >= self.max_attempts:
+            self.conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ? WHERE key = ?",
+                (FAILED, attempts, result.error, key))
+        else:
+            self.conn.execute(
+                "UPDATE outbox SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE key = ?",
+                (attempts, result.error, now + self._backoff(attempts), key))
+
+    def drain(self, mailer, max_wait=None):
+        """
+        投递所有到期的待发邮件，失败的按指数退避重试
+
+        参数:
+            mailer: SMTPMailer 或 MailerPool（需提供 send_all）
+            max_wait (float): 本次最多等待退避的总秒数，默认读取 OUTBOX_MAX_WAIT（120）；
+                              超时仍未投递的邮件留在发件箱，下次运行继续发送
+
+        返回:
+            dict: sent（本次投递成功）、failed（本次放弃）、pending（留待下次）、attempts（本次发送尝试次数）、
+                  failures（本次放弃的邮件：收件人、主题、失败原因）
+        """
+        max_wait = float(max_wait if max_wait is not None else os.getenv("OUTBOX_MAX_WAIT") or 120)
+        deadline = time.monotonic() + max_wait
+        stats = {'sent': 0, 'failed': 0, 'pending': 0, 'attempts': 0, 'failures': []}
+        self._expire(time.time())
+        while True:
+            due = self._due(time.time())
+            if due:
+                outgoing = [OutgoingMail(json.loads(recipients), subject, html)
+                            for _, recipients, subject, html, _ in due]
+                results = mailer.send_all(outgoing)
+                now = time.time()
+                with self.conn:
+                    for (key, _, subject, _, attempts), result in zip(due, results):
+                        self._record(key, attempts + 1, result, now)
+                        if result.ok:
+                            stats['sent'] += 1
+                        elif attempts + 1 >= self.max_attempts:
+                            stats['failed'] += 1
+                            stats['failures'].append((result.to, subject, result.error))
+                stats['attempts'] += len(due)
+                continue
+
+            next_due = self._next_due_at()
+            if next_due is None:
+                break
+            wait = next_due - time.time()
+            if time.monotonic() + wait > deadline:
+                break
+            print(f"发件箱：{self.count(PENDING)} 封邮件等待重试，{wait:.1f}s 后再次发送")
+            time.sleep(max(wait, 0))
+        stats['pending'] = self.count(PENDING)
+        return stats
+
+    def count(self, status=None, slot=None):
+        """按状态（和运行时段）统计邮件数"""
+        conditions, params = [], []
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if slot is not None:
+            conditions.append("run_slot = ?")
+            params.append(slot)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self.conn.execute(f"SELECT COUNT(*) FROM outbox{where}", params).fetchone()[0]
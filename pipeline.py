@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+工资核对流水线：拉取 → 合并 → 变化检测 → 分类 → 渲染 → 发送 → 写快照
+
+各阶段是 SalaryPipeline 上的方法，读写同一份运行状态，可以按需组合：
+工资核对与数据刷新在同一进程里共用一次拉取和合并的结果，不再各自请求工资接口和 GitHub。
+
+用法:
+    SalaryPipeline(pat).run(CHECK_STAGES + ('persist',))   # 核对并写快照
+    SalaryPipeline(pat, job='refresh', include_emails=False).run(REFRESH_STAGES)
+"""
+import os
+
+import metrics
+from snapshot import write_snapshot, resolve_snapshot_path
+from change_detection import load_previous_state, detect_changes, summarize_changes
+from time_window import report_window, beijing_now
+from salary_check import (resolve_salary_months, prefetch_sources, merge_data_by_project,
+                          classify_for_report, render_reports, deliver_reports)
+
+
+STAGES = ('fetch', 'merge', 'detect', 'classify', 'render', 'send', 'persist')
+# 工资核对（不含写快照）与数据刷新的默认阶段
+CHECK_STAGES = ('fetch', 'merge', 'detect', 'classify', 'render', 'send')
+REFRESH_STAGES = ('fetch', 'merge', 'persist')
+
+
+def persist_snapshot(final_df):
+    """
+    写出状态快照（下一轮工资核对按它比对变化）
+
+    参数:
+        final_df (pd.DataFrame): 合并核对人后的工资数据（会添加 creation_time 列）
+
+    返回:
+        str: 快照路径
+    """
+    # 添加当前北京时间到 DataFrame
+    final_df['creation_time'] = beijing_now()
+    # 以列存储快照保存（字典编码字符串 + 原生时间戳）
+    with metrics.current().stage('persist', rows=len(final_df)) as stage:
+        path = write_snapshot(final_df)
+        stage['bytes'] = os.path.getsize(path)
+    print(f" - 快照已写入 {path}")
+    return path
+
+
+class SalaryPipeline:
+    """
+    一轮工资核对/数据刷新的运行状态与各阶段
+
+    每个阶段只在上游阶段产出了数据时执行，否则跳过：没有工资数据时合并、分类、渲染和写快照都跳过；
+    没有需要发送的报告时跳过渲染。发送阶段总是执行：没有新邮件时仍投递发件箱中待重试的邮件。
+    发送通知的运行（include_emails）在有数据源失败或邮件未全部投递时不写快照，
+    避免变化被记为已通知（按变化通知时不会再发送）；按变化通知时，不发送邮件的运行（数据刷新）
+    只在还没有快照时写出初始快照。
+
+    参数:
+        pat (str): GitHub个人访问令牌
+        months (list/str): 工资月份，默认按 SALARY_MONTHS / 上月
+        job (str): 运行指标中的任务名
+        include_emails (bool): 是否拉取邮箱表（不发送邮件时不需要）
+        hours (float): 按时间窗口判断“新提交”时的小时数
+        cache/session/mailer/outbox: 跨轮复用的资源（常驻调度传入），默认按环境变量新建
+    """
+
+    def __init__(self, pat, months=None, job='check', include_emails=True, hours=1.1,
+                 cache=None, session=None, mailer=None, outbox=None):
+        self.pat = pat
+        self.months = resolve_salary_months(months)
+        self.job = job
+        self.include_emails = include_emails
+        self.hours = hours
+        self.cache = cache
+        self.session = session
+        self.mailer = mailer
+        self.outbox = outbox
+
+        self.window = None
+        self.sources = None
+        self.salary_df = None
+        self.checker_df = None
+        self.email_df = None
+        self.final_df = None
+        self.changes = None
+        self.all_records = None
+        self.outgoing = None
+        self.send_stats = None
+        self.snapshot_path = None
+
+    # region 阶段
+    def fetch(self):
+        """并发拉取工资表、核对人表（和邮箱表）"""
+        print(f" - 获取工资数据：{','.join(self.months)}，同时获取 GitHub 信息")
+        with metrics.current().stage('fetch', months=len(self.months)):
+            self.sources = prefetch_sources(self.pat, self.months, cache=self.cache,
+                                            include_emails=self.include_emails, session=self.session)
+        self.salary_df = self.sources['salary'].data
+        self.checker_df = self.sources['checker'].data
+        if self.include_emails:
+            self.email_df = self.sources['email'].data  # 包含邮箱
+        if self.salary_df.empty:
+            print("❗ 没有有效的工资数据可供处理")
+
+    def merge(self):
+        if self.salary_df is None or self.salary_df.empty:
+            return
+        with metrics.current().stage('merge') as stage:
+            self.final_df = merge_data_by_project(self.salary_df, self.checker_df)
+            stage['rows'] = len(self.final_df)
+
+    def detect(self):
+        """与上次快照比对（SALARY_NOTIFY_MODE=delta 且快照存在时），必须在 persist 之前"""
+        if self.final_df is None or os.getenv("SALARY_NOTIFY_MODE", "delta") != "delta":
+            return
+        with metrics.current().stage('detect_changes') as stage:
+            previous = load_previous_state()
+            if previous is not None:
+                self.changes = detect_changes(previous, self.final_df)
+                stage['changed'] = int(self.changes.to_numpy().any(axis=1).sum())
+        if self.changes is not None:
+            summarize_changes(self.changes)
+
+    def classify(self):
+        if self.final_df is None:
+            return
+        self.window = report_window()
+        self.all_records = classify_for_report(self.final_df, self.hours, self.changes, self.window)
+
+    def render(self):
+        if self.all_records is None:
+            return
+        self.outgoing = render_reports(self.all_records, self.email_df, self.window)
+
+    def send(self):
+        """写入本轮邮件（如有）并投递发件箱；没有新邮件时仍重试之前未发送成功的邮件"""
+        self.send_stats = deliver_reports(self.outgoing, self.window, self.mailer, self.outbox)
+
+    def persist(self):
+        if self.final_df is None:
+            return
+        reason = self._persist_blocker()
+        if reason:
+            # 按变化通知时，写快照即视为变化已通知；本轮有遗漏时保留旧快照，下一轮重新检测并发送
+            metrics.current().add('snapshot_skipped')
+            print(f"❗ 本轮不写快照：{reason}")
+            return
+        if self.send_stats and self.send_stats['failed']:
+            print(f"❗ {self.send_stats['failed']} 封邮件投递失败（已放弃），快照照常写入")
+        self.snapshot_path = persist_snapshot(self.final_df)
+
+    def _persist_blocker(self):
+        """
+        不能写快照的原因：发送通知的运行中有数据源获取失败，或本轮的邮件仍在等待重试；
+        按变化通知时不发送邮件的运行（数据刷新）已有快照
+
+        快照是变化通知的基线，数据刷新覆盖它会把尚未通知的变化记为已通知，下一轮核对不再发送
+
+        已放弃的邮件（如收件地址被拒，超过最多尝试次数）不阻止写快照：重发也不会成功，
+        只会让快照一直不前进、每轮重复通知其他收件人；失败已记入运行指标并打印
+        """
+        if not self.include_emails:
+            if os.getenv("SALARY_NOTIFY_MODE", "delta") == "delta" and os.path.exists(resolve_snapshot_path()):
+                return "按变化通知时快照由工资核对写入，数据刷新不覆盖（避免未通知的变化被记为已通知）"
+            return None
+        failed = [name for name, result in (self.sources or {}).items() if result.error]
+        if failed:
+            return f"数据源 {','.join(failed)} 获取失败"
+        if self.send_stats and self.send_stats.get('pending_run'):
+            return f"本轮 {self.send_stats['pending_run']} 封邮件等待重试"
+        return None
+    # endregion
+
+    def run(self, stages=CHECK_STAGES, startup=None):
+        """
+        按顺序执行阶段，并记录本轮运行指标
+
+        参数:
+            stages (tuple): 阶段名称，取自 STAGES
+            startup (dict): 启动耗时（命令行入口传入，如 {'import': 0.4, 'startup': 0.5}），记为阶段指标
+
+        返回:
+            SalaryPipeline: self（各阶段产出可直接读取）
+        """
+        unknown = [stage for stage in stages if stage not in STAGES]
+        if unknown:
+            raise ValueError(f"未知的流水线阶段: {unknown}")
+        run = metrics.start_run(self.job)
+        for name, seconds in (startup or {}).items():
+            run.record_stage(name, seconds)
+        try:
+            for stage in stages:
+                getattr(self, stage)()
+        finally:
+            metrics.finish_run()
+        return self
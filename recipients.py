@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import re
+
+import pandas as pd
+
+
+# 单元格中多个邮箱之间的分隔符（中英文逗号、分号、空白）
+_ADDRESS_SPLIT = re.compile(r'[,，;；\s]+')
+
+
+def normalize_name(name):
+    """核对人/BG名称归一化：去除首尾空白（含全角空格），忽略大小写"""
+    return str(name).replace('　', ' ').strip().casefold()
+
+
+def split_addresses(cell):
+    """拆分并归一化一个单元格里的邮箱地址（去空白、转小写）"""
+    if cell is None or (not isinstance(cell, str) and pd.isna(cell)):
+        return []
+    return [addr.lower() for addr in _ADDRESS_SPLIT.split(str(cell)) if addr]
+
+
+class RecipientDirectory:
+    """
+    收件人目录：每轮运行由邮箱维护表编译一次
+
+    名称（核对人或BG）-> 去重后的邮箱列表，查找为字典访问，不再逐组扫描邮箱表；
+    找不到邮箱的名称集中记录，运行结束时统一输出。
+
+    参数:
+        email_df (pd.DataFrame): 邮箱维护表，含“核对人”“邮箱”两列
+    """
+
+    def __init__(self, email_df):
+        self._addresses = {}
+        self.misses = {}
+        if email_df is None or email_df.empty or not {'核对人', '邮箱'}.issubset(email_df.columns):
+            print("邮箱维护表为空或缺少“核对人/邮箱”列，所有收件人都将无法匹配")
+            return
+        for name, cell in zip(email_df['核对人'].to_numpy(), email_df['邮箱'].to_numpy()):
+            if name is None or (not isinstance(name, str) and pd.isna(name)):
+                continue
+            addresses = self._addresses.setdefault(normalize_name(name), [])
+            for addr in split_addresses(cell):
+                if addr not in addresses:
+                    addresses.append(addr)
+
+    def __len__(self):
+        return len(self._addresses)
+
+    def lookup(self, name, kind='核对人'):
+        """
+        查找名称对应的全部邮箱
+
+        参数:
+            name (str): 核对人或BG名称
+            kind (str): 名称类型，仅用于未命中报告
+
+        返回:
+            list: 邮箱地址列表（未找到时为空列表，并记入未命中报告）
+        """
+        addresses = self._addresses.get(normalize_name(name))
+        if not addresses:
+            self.misses.setdefault(kind, []).append(str(name))
+            return []
+        return addresses
+
+    def report_misses(self):
+        """统一输出本轮未找到邮箱的名称"""
+        if not self.misses:
+            return
+        print("以下收件人未在邮箱维护表中找到邮箱，已跳过发送：")
+        for kind, names in self.misses.items():
+            print(f" - {kind}（{len(names)}）：{'、'.join(names)}")
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import hashlib
+from html import escape
+
+from pandas import isna
+
+from status_engine import DISPLAY_COLUMNS, iter_sections, format_section
+from time_window import beijing_now
+
+
+# region 预编译模板（模块加载时生成一次）
+_STYLE = """
+            <style>
+                body { font-family: 'Microsoft YaHei', Arial, sans-serif; }
+                .container { max-width: 1000px; margin: 0 auto; padding: 20px; }
+                .header { color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px; }
+                .status-section { margin-bottom: 30px; }
+                .status-section h3 {
+                    color: #1e88e5;
+                    border-left: 4px solid #1e88e5;
+                    padding-left: 10px;
+                }
+                .salary-table {
+                    width: 100%;
+                    border-collapse: collapse;
+                    margin: 10px 0;
+                    font-size: 14px;
+                }
+                .salary-table th {
+                    background-color: #f5f5f5;
+                    padding: 12px;
+                    text-align: center;
+                    border-bottom: 2px solid #ddd;
+                }
+                .salary-table td {
+                    padding: 10px;
+                    border-bottom: 1px solid #eee;
+                    text-align: center;
+                }
+                .status-pending { color: #d32f2f; font-weight: bold; }
+                .status-completed { color: #388e3c; }
+                .footer {
+                    margin-top: 20px;
+                    color: #777;
+                    font-size: 12px;
+                    text-align: center;
+                }
+            </style>"""
+
+def _page_head(title):
+    return f"""
+    <html>
+        <head>{_STYLE}
+        </head>
+        <body>
+            <div class="container">
+                <div class="header">
+                    <h2>{title}</h2>
+                </div>"""
+
+
+_REPORT_HEAD = _page_head('工资核对进度')
+_DIGEST_HEAD = _page_head('工资核对汇总')
+
+# 汇总邮件中每份报告的标题
+_PART_HEAD = """
+                <div class="header">
+                    <h2>{title}</h2>
+                </div>"""
+
+_PAGE_TAIL = """
+                <div class="footer">
+                    <p>本邮件由系统自动发送</p>
+                    <p>生成时间：{generated_at}</p>
+                </div>
+            </div>
+        </body>
+    </html>
+    """
+
+_TABLE_HEAD = (
+    '<table border="0" class="dataframe salary-table">\n'
+    '  <thead>\n    <tr style="text-align: center;">'
+    + ''.join(f'<th>{escape(col)}</th>' for col in DISPLAY_COLUMNS)
+    + '</tr>\n  </thead>\n  <tbody>\n'
+)
+_TABLE_TAIL = '  </tbody>\n</table>'
+# endregion
+
+
+def _cell(value):
+    # 空值（None/NaN/NaT）显示为空，与 to_html(na_rep='') 一致
+    if isna(value):
+        return ''
+    return escape(str(value))
+
+
+def render_section_table(rows, label):
+    """
+    直接从列数组拼接表格HTML（不经过 DataFrame.to_html）
+
+    参数:
+        rows (pd.DataFrame): 分节数据（classify_records 的结果切片）
+        label (str): 分节状态值，填入“状态”列
+
+    返回:
+        str: <table> HTML
+    """
+    display = format_section(rows, label)
+    columns = [display[col].to_numpy(dtype=object) for col in DISPLAY_COLUMNS]
+    body = ''.join(
+        '    <tr>' + ''.join(f'<td>{_cell(value)}</td>' for value in record) + '</tr>\n'
+        for record in zip(*columns)
+    )
+    return _TABLE_HEAD + body + _TABLE_TAIL
+
+
+class ReportRenderer:
+    """
+    工资核对报告渲染器（每轮运行创建一个）
+
+    - 样式和页面框架在模块加载时编译一次
+    - 表格直接由列数组生成
+    - 按（数据行, 分节集合）缓存报告正文：同一核对人的多个邮箱、内容相同的BG报告、
+      多封汇总邮件中的同一份报告直接复用。
+      缓存键基于行索引，因此一个渲染器只能用于同一份 classify_records 结果
+
+    参数:
+        generated_at (str): 页脚生成时间，默认取当前北京时间
+    """
+
+    def __init__(self, generated_at=None):
+        if generated_at is None:
+            generated_at = beijing_now().strftime("%Y-%m-%d %H:%M:%S")
+        self.page_tail = _PAGE_TAIL.format(generated_at=generated_at)
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _render_body(self, df):
+        """按状态分节的报告正文（不含页面框架），按行索引缓存"""
+        # 同一轮的分类结果中，行集合相同则分节集合必然相同，行索引即可作为缓存键
+        key = df.index.to_numpy().tobytes()
+        body = self._cache.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        self.misses += 1
+        parts = []
+        for status, label, rows in iter_sections(df):
+            parts.append(f"""
+            <div class="status-section">
+                <h3>{status}（共{len(rows)}条）</h3>
+                {render_section_table(rows, label)}
+            </div>
+            """)
+        body = ''.join(parts)
+        self._cache[key] = body
+        return body
+
+    def render(self, df):
+        """
+        生成按状态分组的HTML报告
+
+        参数:
+            df (pd.DataFrame): classify_records 的结果（或其分组切片）
+
+        返回:
+            str: 完整HTML内容
+        """
+        return _REPORT_HEAD + self._render_body(df) + self.page_tail
+
+    def render_digest(self, parts):
+        """
+        把同一收件人的多份报告合成一封汇总邮件（各份报告正文只渲染一次，多个收件人共用）
+
+        参数:
+            parts (list[tuple]): (标题, classify_records 的分组切片)
+
+        返回:
+            str: 完整HTML内容
+        """
+        html = [_DIGEST_HEAD]
+        for title, df in parts:
+            html.append(_PART_HEAD.format(title=escape(title)))
+            html.append(self._render_body(df))
+        html.append(self.page_tail)
+        return ''.join(html)
+
+    def content_digest(self, html):
+        """报告内容摘要（不含页脚生成时间，内容不变则摘要不变）"""
+        if html.endswith(self.page_tail):
+            html = html[:-len(self.page_tail)]
+        return hashlib.sha1(html.encode('utf-8')).hexdigest()
@@ -1,19 +1,27 @@
 # -*- coding: utf-8 -*-
 import os
-from email.utils import formataddr
-import smtplib
-import email
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.utils import formataddr
-import requests
+import sys
+import time
+import numpy as np
 import pandas as pd
-from io import BytesIO
-from datetime import datetime, timedelta
-
-
-
-def send_salary_reminder(to_email, content_table, subject='工资核对提醒'):
+from urllib.parse import quote
+from datetime import timedelta
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+from github_cache import GitHubExcelCache
+from http_client import default_client
+from salary_ingest import read_salary_workbook, categorize
+from status_engine import classify_records
+from salary_months import parse_months, fetch_salary_months, is_closed_month
+from time_window import RECENT_UPLOAD_MINUTES, report_window, beijing_now, uploaded_since
+# 渲染与发送相关模块（report_render、recipients、mail_sender、outbox）在用到的函数内导入，
+# 只刷新快照、或不在发送窗口内提前结束时不加载 smtplib/email
+
+SALARY_API_URL = "http://121.28.192.238:8562/salary-bytx/saUploadPayroll/getExcel"
+
+
+def send_salary_reminder(to_email, content_table, subject='工资核对提醒', mailer=None):
     """
     发送工资核对提醒邮件（支持HTML表格内容）
 
@@ -21,75 +29,51 @@ def send_salary_reminder(to_email, content_table, subject='工资核对提醒'):
         to_email (str/list): 收件人邮箱，可以是单个字符串或多个邮箱的列表
         content_table (str): HTML表格内容
         subject (str): 邮件主题，默认为'工资核对提醒'
+        mailer (SMTPMailer): 复用的持久化发送器；不传时单独建立一次连接
+
+    返回:
+        bool: 是否发送成功
     """
-    # region SMTP认证配置
-    smtp_user = os.getenv("SMTP_USER")
-    smtp_pass = os.getenv("SMTP_PASS")
+    from mail_sender import SMTPMailer
 
-    username = smtp_user
-    password = smtp_pass
+    if mailer is not None:
+        return mailer.send(to_email, content_table, subject).ok
 
-    # 发件人设置
-    From = formataddr(['工资核对提醒', username])
-    replyto = ''  # 设置回信地址
-    #endregion
-    # region 处理收件人格式（支持字符串或列表）
-    if isinstance(to_email, str):
-        to = to_email
-    else:
-        to = ','.join(to_email)
-    #endregion
-    # region 构建邮件
-    msg = MIMEMultipart('alternative')
-    msg['From'] = From
-    msg['Reply-to'] = replyto
-    msg['To'] = to
-    msg['Subject'] = subject
-    msg['Message-id'] = email.utils.make_msgid()
-    msg['Date'] = email.utils.formatdate()
-
-    # 添加HTML内容
-    msg.attach(MIMEText(content_table, _subtype='html', _charset='UTF-8'))
-    # endregion
-    # region 连接SMTP服务器并发送
-    try:
-        # 尝试SSL连接
-        client = smtplib.SMTP_SSL('smtp.qiye.aliyun.com', 465)
-        print('SMTP_SSL连接成功')
-    except Exception as e1:
-        try:
-            # 尝试普通连接
-            client = smtplib.SMTP('smtp.qiye.aliyun.com', 25, timeout=5)
-            print('SMTP连接成功')
-        except Exception as e2:
-            print('连接服务器失败:', str(e2))
-            return False
+    with SMTPMailer() as one_shot:
+        return one_shot.send(to_email, content_table, subject).ok
+
+def get_salary_data(salary_month):
+    """
+    获取工资表数据（模拟Power Query功能）
 
+    参数:
+        salary_month (str/list): 工资月份，格式如'2023-05'；传入列表时并发拉取多个月份并合并
+
+    返回:
+        pd.DataFrame: 处理后的工资表数据（失败时返回空DataFrame）
+    """
     try:
-        client.login(username, password)
-        print('登录成功')
-        client.sendmail(username, [to] if isinstance(to, str) else to.split(','), msg.as_string())
-        print('邮件发送成功')
-        return True
+        if isinstance(salary_month, (list, tuple)):
+            return load_salary_months(salary_month)
+        return load_salary_data(salary_month)
+
     except Exception as e:
-        print('邮件发送失败:', str(e))
-        return False
-    finally:
-        client.quit()
-    # endregion
+        print(f"获取数据失败: {str(e)}")
+        return pd.DataFrame()  # 返回空DataFrame
 
-def get_salary_data(salary_month):
+def load_salary_data(salary_month, session=None):
     """
-    获取工资表数据（模拟Power Query功能）
+    请求工资接口并解析工资表，失败时抛出异常（供需要区分失败原因的调用方使用）
 
     参数:
         salary_month (str): 工资月份，格式如'2023-05'
+        session (HttpClient): HTTP客户端，默认使用进程内共享的客户端
 
     返回:
         pd.DataFrame: 处理后的工资表数据
     """
-    # 1. 设置请求URL和头部
-    url = "http://121.28.192.238:8562/salary-bytx/saUploadPayroll/getExcel"
+    # 1. 设置请求URL和头部（SALARY_API_URL 可指向测试/基准环境）
+    url = os.getenv("SALARY_API_URL") or SALARY_API_URL
     headers = {
         "Accept": "application/json, text/plain, */*",
         "Content-Type": "application/json;charset=UTF-8",
@@ -115,429 +99,512 @@ def get_salary_data(salary_month):
         }
     }
 
-    try:
-        # 3. 发送POST请求
-        response = requests.post(
-            url,
-            headers=headers,
-            json=post_data,
-            timeout=10
-        )
-        response.raise_for_status()
-
-        # 4. 读取Excel数据（假设返回的是Excel二进制流）
-        from io import BytesIO
-        df = pd.read_excel(BytesIO(response.content), sheet_name="Sheet0")
-
-        # 5. 数据清洗（对应Power Query步骤）
-        # 重命名列（如果第一行是标题）
-        df.columns = df.iloc[0] if 'BG' not in df.columns else df.columns
-        df = df.iloc[1:] if 'BG' not in df.columns else df
-
-        # 转换数据类型
-        df = df.astype({
-            'BG': 'str',
-            '部门': 'str',
-            '基地': 'str',
-            '项目组': 'str',
-            '上传人': 'str',
-            '终版上传人': 'str',
-        })
-        df['工资月份'] = pd.to_datetime(df['工资月份'])
-        df['上传时间'] = pd.to_datetime(df['上传时间'])
-        df['终版上传时间'] = pd.to_datetime(df['终版上传时间'], errors='coerce')  # 处理可能的空值
-        df = df.rename(columns={'是否核对': '成本是否核对'})
-
-        # 将'成本是否核对'列中的空值转为'否'
-        if '成本是否核对' in df.columns:
-            df['成本是否核对'] = df['成本是否核对'].fillna('未核对')
-            # 替换数值为对应的文本
-        df['成本是否核对'] = df['成本是否核对'].replace({
-            0: '未核对',
-            1: '已通过',
-            2: '否',
-            '0': '未核对',  # 如果数据是字符串格式的 '0', '1', '2'
-            '1': '已通过',
-            '2': '否'
-        })
-
-        # 6. 筛选行（排除特定项目组）
-        filter_condition = (
-                ~df['项目组'].str.contains('共享中心|劳务派遣|招聘中台平台', na=False) &
-                ~df['基地'].str.contains('总部职能', na=False)
-        )
-        df = df[filter_condition].reset_index(drop=True)
-        return df
+    # 3. 发送POST请求（共享连接池，失败按退避重试，响应体流式读入临时缓冲）
+    download = (session or default_client()).post(url, name='salary', headers=headers, json=post_data)
 
-    except Exception as e:
-        print(f"获取数据失败: {str(e)}")
-        return pd.DataFrame()  # 返回空DataFrame
+    # 4. 流式读取Excel数据（只读模式，逐行完成类型转换和项目组过滤）
+    with download.body as body:
+        return read_salary_workbook(body, sheet_name="Sheet0")
 
-def get_github_excel(github_pat):
+def load_salary_months(months, cache=None, session=None):
     """
-    从GitHub仓库获取Excel文件
+    有界并发拉取多个工资月份并合并，已关账月份读按月缓存，失败时抛出异常
 
     参数:
-        github_pat (str): GitHub个人访问令牌
+        months (list[str]): 工资月份列表
+        cache (SalaryMonthCache): 按月缓存
+        session (HttpClient): HTTP客户端
 
     返回:
-        pd.DataFrame: 包含项目与核对人关系的DataFrame
+        pd.DataFrame: 各月份工资数据拼接结果
+    """
+    source = os.getenv("SALARY_API_URL") or SALARY_API_URL
+    return fetch_salary_months(list(months), lambda month: load_salary_data(month, session),
+                               source=source, cache=cache)
+
+def resolve_salary_months(spec=None):
     """
-    url = "https://api.github.com/repos/BYTX-YGJ/excel/contents/%E5%B7%A5%E8%B5%84%E6%A0%B8%E7%AE%97%E4%BA%BA%E7%BB%9F%E8%AE%A1.xlsx"
+    本轮要处理的工资月份：参数或环境变量 SALARY_MONTHS（如 '2023-03~2023-05,2023-08'），
+    均未设置时只处理上月
+    """
+    return parse_months(spec or os.getenv("SALARY_MONTHS"), default=[get_last_month_str()])
+
+GITHUB_CONTENTS_URL = "https://api.github.com/repos/BYTX-YGJ/excel/contents"
+GITHUB_CHECKER_FILE = "工资核算人统计.xlsx"
+GITHUB_EMAIL_FILE = "邮箱维护.xlsx"
 
+def github_excel_url(filename):
+    """GitHub contents API 文件地址（GITHUB_CONTENTS_URL 可指向测试/基准环境）"""
+    base = os.getenv("GITHUB_CONTENTS_URL") or GITHUB_CONTENTS_URL
+    return f"{base.rstrip('/')}/{quote(filename)}"
+
+def load_github_excel(url, github_pat, cache=None):
+    """
+    通过本地条件缓存（ETag）获取GitHub上的Excel，失败时抛出异常
+    """
     headers = {
         "Authorization": f"token {github_pat}",
         "Accept": "application/vnd.github.v3.raw"
     }
+    cache = cache or GitHubExcelCache()
+    return cache.fetch_excel(url, headers, sheet_name="Sheet1")
 
+def _fetch_github_excel(url, github_pat, cache=None):
+    """
+    获取GitHub上的Excel，失败时返回空DataFrame
+    """
     try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-
-        # 读取Excel数据
-        df = pd.read_excel(BytesIO(response.content), sheet_name="Sheet1")
-        return df
+        return load_github_excel(url, github_pat, cache)
 
     except Exception as e:
         print(f"从GitHub获取数据失败: {str(e)}")
         return pd.DataFrame()
 
-def get_github_excel1(github_pat):
+def get_github_excel(github_pat, cache=None):
     """
     从GitHub仓库获取Excel文件
 
     参数:
         github_pat (str): GitHub个人访问令牌
+        cache (GitHubExcelCache): 本地缓存，默认按环境变量配置
 
     返回:
         pd.DataFrame: 包含项目与核对人关系的DataFrame
     """
-    url = "https://api.github.com/repos/BYTX-YGJ/excel/contents/邮箱维护.xlsx"
+    return _fetch_github_excel(github_excel_url(GITHUB_CHECKER_FILE), github_pat, cache)
 
-    headers = {
-        "Authorization": f"token {github_pat}",
-        "Accept": "application/vnd.github.v3.raw"
-    }
+def get_github_excel1(github_pat, cache=None):
+    """
+    从GitHub仓库获取Excel文件
 
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
+    参数:
+        github_pat (str): GitHub个人访问令牌
+        cache (GitHubExcelCache): 本地缓存，默认按环境变量配置
 
-        # 读取Excel数据
-        df = pd.read_excel(BytesIO(response.content), sheet_name="Sheet1")
-        return df
+    返回:
+        pd.DataFrame: 包含核对人/BG与邮箱关系的DataFrame
+    """
+    return _fetch_github_excel(github_excel_url(GITHUB_EMAIL_FILE), github_pat, cache)
 
+# 单个数据源的获取结果：名称、数据、耗时（秒）、错误信息
+SourceResult = namedtuple('SourceResult', ['name', 'data', 'seconds', 'error'])
+
+def _timed_source(name, loader, *args):
+    """执行单个数据源的下载+解析并计时，异常转为 SourceResult.error"""
+    start = time.perf_counter()
+    try:
+        data = loader(*args)
+        error = None
     except Exception as e:
-        print(f"从GitHub获取数据失败: {str(e)}")
-        return pd.DataFrame()
+        data = pd.DataFrame()
+        error = str(e)
+    return SourceResult(name, data, time.perf_counter() - start, error)
+
+def prefetch_sources(pat, salary_month, fail_fast=False, cache=None, include_emails=True, session=None):
+    """
+    并发获取工资表、核对人表、邮箱表三个数据源
+
+    每个数据源在独立线程中完成下载和解析，一个数据源解析时其他数据源仍在下载，
+    整体耗时约等于最慢的单个数据源。
+
+    参数:
+        pat (str): GitHub个人访问令牌
+        salary_month (str/list): 工资月份，格式如'2023-05'；传入多个月份或已关账的月份时按月缓存并有界并发拉取
+        fail_fast (bool): True 时任一数据源失败立即抛出 RuntimeError；
+                          False 时失败的数据源降级为空DataFrame，其余照常返回
+        cache (GitHubExcelCache): GitHub文件缓存
+        include_emails (bool): 是否获取邮箱表（数据刷新流程不需要）
+        session (HttpClient): HTTP客户端（常驻调度时跨轮保持连接），默认使用进程内共享的客户端
+
+    返回:
+        dict: 数据源名称 -> SourceResult（'salary'、'checker'、'email'）
+    """
+    cache = cache or GitHubExcelCache(session=session)
+    months = list(salary_month) if isinstance(salary_month, (list, tuple)) else [salary_month]
+    # 单个在途月份直接请求；已关账的月份（如回查 --months 2023-05）走按月缓存
+    if len(months) > 1 or is_closed_month(months[0]):
+        salary_task = (load_salary_months, months, None, session)
+    else:
+        salary_task = (load_salary_data, months[0], session)
+    tasks = {
+        'salary': salary_task,
+        'checker': (load_github_excel, github_excel_url(GITHUB_CHECKER_FILE), pat, cache),
+    }
+    if include_emails:
+        tasks['email'] = (load_github_excel, github_excel_url(GITHUB_EMAIL_FILE), pat, cache)
+
+    results = {}
+    run = metrics.current()
+    executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='prefetch')
+    try:
+        futures = [executor.submit(_timed_source, name, *task) for name, task in tasks.items()]
+        for future in as_completed(futures):
+            result = future.result()
+            results[result.name] = result
+            run.record_stage(f'fetch:{result.name}', result.seconds, rows=len(result.data),
+                             **({'error': result.error} if result.error else {}))
+            if result.error:
+                print(f" - 数据源 {result.name} 获取失败（{result.seconds:.2f}s）: {result.error}")
+                if fail_fast:
+                    raise RuntimeError(f"数据源 {result.name} 获取失败: {result.error}")
+            else:
+                print(f" - 数据源 {result.name} 获取完成：{len(result.data)} 行，耗时 {result.seconds:.2f}s")
+    finally:
+        # fail_fast 时不等待仍在进行的请求
+        executor.shutdown(wait=not fail_fast, cancel_futures=fail_fast)
+    return results
 
 def merge_data_by_project(salary_df, checker_df):
     """
     以项目组为主键合并数据，保留salary_df所有项目，补充checker_df的核对人信息
 
+    两侧项目组统一为同一组类别后按整数编码连接：核对人表中项目唯一时直接按编码查表取核对人，
+    不复制工资数据的其他列；项目有重复时退回 pd.merge（同样基于相同类别的编码），行为与左连接一致。
+
     参数:
         salary_df (pd.DataFrame): 第一个查询的数据（含项目组，无核对人）
         checker_df (pd.DataFrame): 第二个查询的数据（含项目和核对人）
 
     返回:
-        pd.DataFrame: 合并后的数据
+        pd.DataFrame: 合并后的数据（核对人为 category，未匹配为缺失值）
     """
     # 标准化列名（确保都有"项目组"列）
     checker_df = checker_df.rename(columns={'项目': '项目组'})
-
-    # 左连接合并（保留salary_df所有项目组）
-    merged_df = pd.merge(
-        left=salary_df,
-        right=checker_df[['项目组', '工资核对人']],  # 只取需要的列
-        on='项目组',
-        how='left'
+    if not {'项目组', '工资核对人'}.issubset(checker_df.columns):
+        print("核对人表缺少“项目/工资核对人”列，核对人全部留空")
+        checker_df = pd.DataFrame({'项目组': pd.Series(dtype=object), '工资核对人': pd.Series(dtype=object)})
+
+    # 两侧项目组使用同一组类别，连接只比较整数编码
+    projects = pd.CategoricalDtype(
+        pd.Index(salary_df['项目组'].astype(object).dropna().unique())
+        .union(pd.Index(checker_df['项目组'].astype(object).dropna().unique()))
     )
+    left_codes = salary_df['项目组'].astype(object).astype(projects).cat.codes.to_numpy()
+    right_codes = checker_df['项目组'].astype(object).astype(projects).cat.codes.to_numpy()
+    checkers = checker_df['工资核对人'].astype('category')
+
+    matched = right_codes[right_codes >= 0]
+    if len(np.unique(matched)) == len(matched):
+        # 项目唯一：项目编码 -> 核对人表行号，一次查表完成左连接
+        # 两张查找表末尾各放一个 -1 哨兵：空项目组/未匹配的编码 -1 正好取到哨兵
+        position = np.full(len(projects.categories) + 1, -1, dtype=np.int64)
+        position[matched] = np.flatnonzero(right_codes >= 0)
+        checker_codes = np.append(checkers.cat.codes.to_numpy(), -1)[position[left_codes]]
+        merged_df = salary_df.assign(核对人=pd.Categorical.from_codes(
+            checker_codes, dtype=checkers.dtype))
+    else:
+        # 项目有重复：保持 pd.merge 的一对多语义（空项目不参与匹配）
+        right = checker_df.loc[right_codes >= 0, ['项目组', '工资核对人']]
+        merged_df = pd.merge(
+            left=salary_df.assign(项目组=salary_df['项目组'].astype(object).astype(projects)),
+            right=right.assign(项目组=right['项目组'].astype(object).astype(projects)),
+            on='项目组',
+            how='left'
+        ).rename(columns={'工资核对人': '核对人'})
+
+    return categorize(merged_df)
+
+def classify_for_report(final_df, hours, changes=None, window=None):
+    """
+    报告前的检查与状态分类
 
-    # 重命名列（保持一致性）
-    merged_df = merged_df.rename(columns={'工资核对人': '核对人'})
-
-    return merged_df
+    参数:
+        final_df (pd.DataFrame): 合并核对人后的工资数据
+        hours (float): 按时间窗口判断“新提交”时的小时数
+        changes (pd.DataFrame): detect_changes 的结果（按变化通知）
+        window (ReportWindow): 报告时间窗口，默认取当前时间
 
-def send_complete_salary_report(final_df,github_df1,hours):
-    """
-    发送完整的工资核对报告，包含：
-    - 最近1小时新提交记录（待核对）
-    - 历史未核对记录（待核对）
-    - 已完成核对记录（有终版上传时间）
+    返回:
+        pd.DataFrame: classify_records 的结果；缺少必要列、没有变化或没有待核对记录时返回 None
     """
     # 检查必要列是否存在
     required_columns = ['BG', '部门', '基地', '项目组', '工资月份',
                         '上传时间', '终版上传时间', '核对人']
     if not all(col in final_df.columns for col in required_columns):
         print("数据中缺少必要列！")
-        return False
+        return None
 
-    # 转换时间列
-    final_df['上传时间'] = pd.to_datetime(final_df['上传时间'])
-    final_df['终版上传时间'] = pd.to_datetime(final_df['终版上传时间'], errors='coerce')
+    window = window or report_window()
+    # 按变化通知时，没有任何变化且非定时则无需继续
+    if changes is not None and not changes.to_numpy().any() and not window.is_scheduled_time:
+        print("自上次快照以来没有变化，无需发送")
+        return None
 
     # 时间阈值：当前时间前一小时
 
-    time_threshold = datetime.now() - timedelta(hours=hours)+ timedelta(hours=8)
+    time_threshold = window.now - timedelta(hours=hours)
     print("timedelta(hours=hours)",timedelta(hours=hours))
     print("time_threshold",time_threshold)
-    # 1. 最近1小时内的新提交记录
-    recent_records = final_df[(final_df['上传时间'] >= time_threshold)&(final_df['终版上传时间'].isna())].copy()
-
-    # 2. 历史未完成记录（无终版上传时间，且上传时间早于1小时以前）
-    pending_records = final_df[
-        (final_df['终版上传时间'].isna()) &
-        (final_df['上传时间'] < time_threshold)
-    ].copy()
-
-    # 3. 已完成记录（有终版上传时间）
-    completed_records = final_df[final_df['终版上传时间'].notna()].copy()
-
-    # 4.未上传的
-    not_submitted = final_df[
-        (final_df['终版上传时间'].isna()) &
-        (final_df['上传时间'].isna())
-    ].copy()
-
-    # 5. 成本未核对的
-    # 从 recent_records 中筛选成本未核对的记录
-    recent_unchecked = recent_records[recent_records['成本是否核对'] == '未核对'].copy()
-    # 从 pending_records 中筛选成本未核对的记录
-    pending_unchecked = pending_records[pending_records['成本是否核对'] == '未核对'].copy()
-    # 合并两个结果（垂直合并）
-    cost_unchecked = pd.concat([recent_unchecked, pending_unchecked], ignore_index=True)
-    # 去重
-    isCost = cost_unchecked.drop_duplicates()
-
-    # 5. 成本未核对的
-    # 从 recent_records 中筛选成本未核对的记录
-    recent_notunchecked = recent_records[recent_records['成本是否核对'] == '否'].copy()
-    # 从 pending_records 中筛选成本未核对的记录
-    pending_notunchecked = pending_records[pending_records['成本是否核对'] == '否'].copy()
-    # 合并两个结果（垂直合并）
-    cost_notunchecked = pd.concat([recent_notunchecked, pending_notunchecked], ignore_index=True)
-    # 去重
-    isnotCost = cost_notunchecked.drop_duplicates()
+    # BG 成本未确认提醒的上传时间下限（按时间窗口通知时）
+    recent_since = None if changes is not None else window.now - timedelta(minutes=RECENT_UPLOAD_MINUTES)
+
+    # 单次向量化计算状态：状态（进度）+ 成本状态，同时属于两类的行不再复制；
+    # 各时间判断在这里整列算一次，后续分组只取布尔列
+    with metrics.current().stage('classify', rows=len(final_df)):
+        all_records = classify_records(final_df, time_threshold, changes, recent_since)
+
     # 没有待核对的记录则不发送
-    if recent_records.empty and pending_records.empty:
+    if not all_records['状态'].isin(['待核对（新提交）', '待核对（历史未完成）']).any():
         print("没有需要核对的工资记录")
+        return None
+    return all_records
+
+def render_reports(all_records, github_df1, window):
+    """
+    渲染全部待发邮件
+
+    参数:
+        all_records (pd.DataFrame): classify_for_report 的结果
+        github_df1 (pd.DataFrame/RecipientDirectory): 邮箱维护表或已编译的收件人目录
+        window (ReportWindow): 报告时间窗口
+
+    返回:
+        list[OutgoingMail]: 待发邮件
+    """
+    from recipients import RecipientDirectory
+
+    # 邮箱表每轮只编译一次为收件人目录
+    with metrics.current().stage('render') as stage:
+        directory = github_df1 if isinstance(github_df1, RecipientDirectory) else RecipientDirectory(github_df1)
+        outgoing = _render_grouped_reports(all_records, directory, window.now,
+                                           window.is_near_hour, window.is_scheduled_time)
+        stage['messages'] = len(outgoing)
+    print(f"共渲染 {len(outgoing)} 封待发邮件")
+    return outgoing
+
+def deliver_reports(outgoing, window, mailer=None, outbox=None):
+    """
+    写入发件箱并投递（默认有界并发，传入 SMTPMailer 则串行）
+
+    本轮没有新邮件（outgoing 为 None 或空）时只跳过写入，仍然投递发件箱中之前未发送成功的邮件：
+    故障后的几轮通常没有变化，不能等到下次有新报告时才重试
+
+    参数:
+        outgoing (list[OutgoingMail]): 本轮渲染的邮件，可为 None
+        window (ReportWindow): 报告时间窗口（写入时计算运行时段），没有新邮件时可为 None
+
+    返回:
+        dict: Outbox.drain 的统计，另加 pending_run（本轮写入、仍待重试的邮件数）
+    """
+    from mail_sender import MailerPool
+    from outbox import Outbox, PENDING, run_slot
+
+    run = metrics.current()
+    own_outbox = outbox is None
+    if own_outbox:
+        outbox = Outbox()
+    own_mailer = mailer is None
+    if own_mailer:
+        mailer = MailerPool()
+    outgoing = outgoing or []
+    slot = run_slot(window.now) if outgoing else None
+    try:
+        queued = 0
+        if outgoing:
+            queued = outbox.enqueue(outgoing, slot)
+            print(f"发件箱新增 {queued} 封，跳过 {len(outgoing) - queued} 封本时段已入队的邮件")
+        with run.stage('send', messages=len(outgoing), queued=queued) as stage:
+            try:
+                stats = outbox.drain(mailer)
+            finally:
+                if own_mailer:
+                    mailer.close()
+            stage['attempts'] = stats['attempts']
+        stats['pending_run'] = outbox.count(PENDING, slot) if slot else 0
+    finally:
+        if own_outbox:
+            outbox.close()
+
+    run.add('messages_sent', stats['sent'])
+    run.add('messages_failed', stats['failed'])
+    run.add('messages_pending', stats['pending'])
+    print(f"本轮邮件发送完成：成功 {stats['sent']} 封，失败 {stats['failed']} 封，"
+          f"待重试 {stats['pending']} 封，SMTP会话 {mailer.summary()['sessions']} 次")
+    for to, subject, error in stats['failures']:
+        print(f"发送失败：{','.join(to)} {subject} - {error}")
+    return stats
+
+def send_complete_salary_report(final_df,github_df1,hours,mailer=None,changes=None,outbox=None):
+    """
+    发送完整的工资核对报告，包含：
+    - 最近1小时新提交记录（待核对）
+    - 历史未核对记录（待核对）
+    - 已完成核对记录（有终版上传时间）
+
+    先渲染全部邮件再统一投递。mailer 可传入 SMTPMailer（单连接串行发送）或
+    MailerPool（有界并发+按主机限速），不传时按环境变量创建 MailerPool 并在结束时关闭
+
+    github_df1 为邮箱维护表（或已编译好的 RecipientDirectory），每个核对人/BG 的全部邮箱合并为一封邮件
+
+    传入 changes（detect_changes 的结果）时按变化通知：“新提交”和BG的成本未确认提醒
+    只看上次快照以来真实发生的变化，不再依赖 1.1 小时/30 分钟时间窗口，也不受整点限制
+
+    渲染好的邮件先写入持久化发件箱（outbox，默认 OUTBOX_PATH），再按指数退避投递：
+    同一小时内重跑不会重复发送已投递的邮件，上次未投递成功的邮件本轮继续发送
+
+    由 classify_for_report、render_reports、deliver_reports 三步组成，流水线（pipeline.py）中分别作为独立阶段
+    """
+    window = report_window()
+    all_records = classify_for_report(final_df, hours, changes, window)
+    if all_records is None:
+        # 没有新报告也投递发件箱中待重试的邮件
+        deliver_reports(None, window, mailer, outbox)
         return False
+    outgoing = render_reports(all_records, github_df1, window)
+    deliver_reports(outgoing, window, mailer, outbox)
+    return True
+
+# 一份待发报告：类型（核对人/BG）、名称、单独发送时的主题、数据（分组切片）、收件邮箱
+ReportUnit = namedtuple('ReportUnit', ['kind', 'name', 'subject', 'rows', 'to'])
 
-    # 为每类记录添加状态标签（仅在非空时设置）
-    if not recent_records.empty:
-        recent_records.loc[:, '状态'] = '待核对（新提交）'
-    if not pending_records.empty:
-        pending_records.loc[:, '状态'] = '待核对（历史未完成）'
-    if not completed_records.empty:
-        completed_records.loc[:, '状态'] = '已完成'
-    if not not_submitted.empty:
-        not_submitted.loc[:, '状态'] = '未提交'
-    if not isCost.empty:
-        isCost.loc[:, '状态'] = '成本未确认'
-    if not isnotCost.empty:
-        isnotCost.loc[:, '状态'] = '成本未通过'
-    # 合并所有记录
-    all_records = pd.concat([isCost,isnotCost,recent_records, pending_records, completed_records,not_submitted], ignore_index=True)
-
-    # 格式化时间列
-    time_format = '%Y-%m-%d %H:%M'
-    all_records['上传时间'] = pd.to_datetime(all_records['上传时间'], errors='coerce').dt.strftime(time_format)
-    all_records['终版上传时间'] = pd.to_datetime(all_records['终版上传时间'], errors='coerce').dt.strftime(time_format)
-    all_records['工资月份'] = pd.to_datetime(all_records['工资月份'], errors='coerce').dt.strftime('%Y-%m')
-
-    # 指定需要展示的列
-    display_columns = ['BG', '部门', '基地', '项目组', '工资月份',
-                       '上传时间', '终版上传时间', '状态', '核对人']
-    all_records = all_records[display_columns]
-
-    # 设置北京时区
-    now = datetime.now()+ timedelta(hours=8)
-    time_tolerance = timedelta(minutes=10)
-    scheduled_times = [
-        now.replace(hour=9, minute=0, second=0, microsecond=0)
-    ]
-    is_scheduled_time = any(abs(now - scheduled_time) <= time_tolerance for scheduled_time in scheduled_times)
-    # 检查当前时间是否为整点（允许±5分钟误差）
-    is_near_hour = (now.minute <= 5) or (now.minute >= 55)
-
-    if is_near_hour:
+def _collect_report_units(all_records, directory, now, is_near_hour, is_scheduled_time):
+    """
+    按核对人、按BG分组，筛选本轮需要发送的报告
+
+    返回:
+        list[ReportUnit]: 待发报告（找不到邮箱的已跳过，统一在最后报告）
+    """
+    units = []
+    # 按变化通知：变化只会被检测到一次，因此不再受整点窗口限制
+    delta_mode = '有变化' in all_records.columns
+    if delta_mode:
+        is_new = all_records['有变化']
+    elif '近期上传' in all_records.columns:
+        is_new = all_records['近期上传']
+    else:
+        # 分类时未计算“近期上传”：整列比较一次，不在各组内重复
+        is_new = pd.Series(uploaded_since(all_records['上传时间'], now - timedelta(minutes=RECENT_UPLOAD_MINUTES)),
+                           index=all_records.index)
+    if is_near_hour or delta_mode:
         # 分组按核对人发送邮件（仅满足条件才发）
-        for checker, group in all_records.groupby('核对人'):
+        for checker, group in all_records.groupby('核对人', observed=True):
             has_new = (group['状态'] == '待核对（新提交）').any()
 
             if has_new or is_scheduled_time:
-                # 从github_df1中查找邮箱
-                to_email = github_df1.loc[github_df1['核对人'] == checker, '邮箱'].values
-                if len(to_email) == 0:
-                    print(f"未找到 {checker} 的邮箱地址，跳过发送")
+                # 从收件人目录中查找邮箱（未找到的统一在最后报告）
+                to_email = directory.lookup(checker, '核对人')
+                if not to_email:
                     continue
-                # to_email = to_email[0]
-                for emails in to_email:
-                    html_content = create_status_html(group)
-                    send_salary_reminder(
-                        to_email=emails,
-                        content_table=html_content,
-                        subject=f"【您的待核对】{now.strftime('%m-%d')} "
-                    )
+                units.append(ReportUnit('核对人', checker, f"【您的待核对】{now.strftime('%m-%d')} ",
+                                        group, to_email))
             else:
                 print(f"{checker} 无需发送邮件（无新增，非定时）")
-    for checker, group in all_records.groupby('BG'):
+    for checker, group in all_records.groupby('BG', observed=True):
         # has_new = (group['状态'] == '成本未确认').any()
         # # 2. 检查这些记录的上传时间是否在最近半小时内(has_new and recent_uploads)
         # recent_uploads = (group['上传时间'] >= (now - timedelta(minutes=30))).any()
 
         # 1. 筛选出“成本未确认”的记录
-        unconfirmed = group[group['状态'] == '成本未确认']
-        # 2. 进一步筛选出最近30分钟内上传的记录
-        # recent_unconfirmed = unconfirmed[unconfirmed['上传时间'] >= (now - timedelta(minutes=30))]
-        recent_unconfirmed = unconfirmed[pd.to_datetime(unconfirmed['上传时间']) >= (now - timedelta(minutes=30))]
+        unconfirmed = group[group['成本状态'] == '成本未确认']
+        # 2. 进一步筛选出新变化的记录（按变化通知）或最近30分钟内上传的记录（取预先算好的布尔列）
+        recent_unconfirmed = unconfirmed[is_new[unconfirmed.index]]
 
         if not recent_unconfirmed.empty or is_scheduled_time:
-            # 从github_df1中查找邮箱
-            to_email = github_df1.loc[github_df1['核对人'] == checker, '邮箱'].values
-            if len(to_email) == 0:
-                print(f"未找到 {checker} 的邮箱地址，跳过发送")
+            # 从收件人目录中查找邮箱（未找到的统一在最后报告）
+            to_email = directory.lookup(checker, 'BG')
+            if not to_email:
                 continue
-            # to_email = to_email[0]
-            for emails in to_email:
-                html_content = create_status_html(group)
-                send_salary_reminder(
-                    to_email=emails,
-                    content_table=html_content,
-                    subject=f"【{checker}工资核对进度】{now.strftime('%m-%d')}"
-                )
+            units.append(ReportUnit('BG', checker, f"【{checker}工资核对进度】{now.strftime('%m-%d')}",
+                                    group, to_email))
         else:
             print(f"{checker} 无需发送邮件（无新增，非定时）")
+    return units
 
-    return True
+def _digest_groups(units):
+    """
+    按收件邮箱汇总报告：每个邮箱收到的全部报告合成一封；收到的报告完全相同的邮箱共用一封邮件
+
+    返回:
+        list[tuple]: (邮箱列表, 报告列表)，按报告首次出现的顺序
+    """
+    per_address = {}
+    for position, unit in enumerate(units):
+        for address in unit.to:
+            per_address.setdefault(address, []).append(position)
+    groups = {}
+    for address, positions in per_address.items():
+        groups.setdefault(tuple(positions), []).append(address)
+    return [(addresses, [units[i] for i in positions]) for positions, addresses in sorted(groups.items())]
+
+def _render_grouped_reports(all_records, directory, now, is_near_hour, is_scheduled_time, digest=None):
+    """
+    按核对人、按BG分组渲染报告邮件
+
+    - 单独发送（SALARY_REPORT_MODE=separate）：每个核对人/BG一封邮件，同时发给该组的全部邮箱
+    - 汇总发送（默认，SALARY_REPORT_MODE=digest）：每个邮箱每轮只收一封邮件，包含其作为核对人和BG联系人的
+      全部报告；只有一份报告时与单独发送的邮件相同。各份报告的正文只渲染一次，多封邮件共用
+
+    返回:
+        list[OutgoingMail]: 待发邮件
+    """
+    from report_render import ReportRenderer
+    from mail_sender import OutgoingMail
+
+    if digest is None:
+        digest = os.getenv("SALARY_REPORT_MODE", "digest") == "digest"
+    # 整轮共用一个渲染器，同一份报告只渲染一次
+    renderer = ReportRenderer()
+    units = _collect_report_units(all_records, directory, now, is_near_hour, is_scheduled_time)
+
+    outgoing = []
+    if digest:
+        for addresses, parts in _digest_groups(units):
+            if len(parts) == 1:
+                subject, html = parts[0].subject, renderer.render(parts[0].rows)
+            else:
+                subject = f"【工资核对汇总】{now.strftime('%m-%d')}"
+                html = renderer.render_digest([
+                    (f"您的待核对（{unit.name}）" if unit.kind == '核对人' else f"{unit.name}工资核对进度", unit.rows)
+                    for unit in parts])
+            outgoing.append(OutgoingMail(to=addresses, subject=subject, html=html,
+                                         digest=renderer.content_digest(html)))
+        print(f"汇总发送：{len(units)} 份报告合并为 {len(outgoing)} 封邮件")
+    else:
+        for unit in units:
+            html = renderer.render(unit.rows)
+            outgoing.append(OutgoingMail(to=unit.to, subject=unit.subject, html=html,
+                                         digest=renderer.content_digest(html)))
+
+    print(f"报告渲染 {renderer.misses} 次，复用 {renderer.hits} 次")
+    directory.report_misses()
+    return outgoing
 
 def create_status_html(df):
     """
     生成按状态分组的HTML报告
 
     参数:
-        df (pd.DataFrame): 包含状态标签的完整数据
+        df (pd.DataFrame): classify_records 的结果（含状态、成本状态两列）
 
     返回:
         str: 美化后的HTML内容
     """
-    # 按状态分组
-    status_groups = {
-        '成本未确认的': df[df['状态'] == '成本未确认'],
-        '成本未通过的': df[df['状态'] == '成本未通过'],
-        '待核对（新提交）': df[df['状态'] == '待核对（新提交）'],
-        '待核对（历史未完成）': df[df['状态'] == '待核对（历史未完成）'],
-        '已完成': df[df['状态'] == '已完成'],
-        '未提交': df[df['状态'] == '未提交']
-    }
+    from report_render import ReportRenderer
 
-    # 生成每个组的表格
-    tables_html = ""
-    for status, group_df in status_groups.items():
-        if not group_df.empty:
-            table_html = group_df.to_html(
-                index=False,
-                classes='salary-table',
-                border=0,
-                justify='center',
-                na_rep=''
-            )
-            tables_html += f"""
-            <div class="status-section">
-                <h3>{status}（共{len(group_df)}条）</h3>
-                {table_html}
-            </div>
-            """
-
-    # 完整HTML结构
-    # 获取当前北京时间
-    now_beijing = (datetime.now()+ timedelta(hours=8)).strftime("%Y-%m-%d %H:%M:%S")
-    beautiful_html = f"""
-    <html>
-        <head>
-            <style>
-                body {{ font-family: 'Microsoft YaHei', Arial, sans-serif; }}
-                .container {{ max-width: 1000px; margin: 0 auto; padding: 20px; }}
-                .header {{ color: #333; border-bottom: 2px solid #eee; padding-bottom: 10px; }}
-                .status-section {{ margin-bottom: 30px; }}
-                .status-section h3 {{
-                    color: #1e88e5;
-                    border-left: 4px solid #1e88e5;
-                    padding-left: 10px;
-                }}
-                .salary-table {{
-                    width: 100%;
-                    border-collapse: collapse;
-                    margin: 10px 0;
-                    font-size: 14px;
-                }}
-                .salary-table th {{
-                    background-color: #f5f5f5;
-                    padding: 12px;
-                    text-align: center;
-                    border-bottom: 2px solid #ddd;
-                }}
-                .salary-table td {{
-                    padding: 10px;
-                    border-bottom: 1px solid #eee;
-                    text-align: center;
-                }}
-                .status-pending {{ color: #d32f2f; font-weight: bold; }}
-                .status-completed {{ color: #388e3c; }}
-                .footer {{
-                    margin-top: 20px;
-                    color: #777;
-                    font-size: 12px;
-                    text-align: center;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>工资核对进度</h2>
-                </div>
-                {tables_html}
-                <div class="footer">
-                    <p>本邮件由系统自动发送</p>
-                    <p>生成时间：{now_beijing}</p>
-                </div>
-            </div>
-        </body>
-    </html>
-    """
-    return beautiful_html
+    return ReportRenderer().render(df)
 
 def get_last_month_str():
-    today = datetime.today().replace(day=1)
+    today = beijing_now().replace(day=1)
     last_month = today - timedelta(days=1)
     return last_month.strftime('%Y-%m')
 
-def run_salary_check_process(pat):
+def run_salary_check_process(pat, months=None, cache=None, mailer=None, session=None, persist=True):
     """
     工资核对流程执行函数：
-    1. 获取上月工资数据
+    1. 获取上月工资数据（或 months / SALARY_MONTHS 指定的多个月份，一并分类和发送）
     2. 获取 GitHub 上的核对人信息
     3. 合并处理后发送邮件报告
-    """
-    print("▶ 开始工资核对流程...")
+    4. persist=True 时用同一份合并结果写出状态快照（不再另起数据刷新流程重复拉取）
 
-    # 1. 获取原始工资数据（上一个月）
-    salary_month = get_last_month_str()
-    print(f" - 获取工资数据：{salary_month}")
-    salary_df = get_salary_data(salary_month)
-    # 2. 获取GitHub上的核对人信息（PAT 应该来自安全来源）
-    print(" - 获取 GitHub 信息")
-    github_df = get_github_excel(pat)
-    github_df1 = get_github_excel1(pat)  # 包含邮箱
-
-    # 3. 合并 & 发送核对报告
-    if not salary_df.empty:
-        final_df = merge_data_by_project(salary_df, github_df)
-        send_complete_salary_report(final_df, github_df1, 1.1)
-    else:
-        print("❗ 没有有效的工资数据可供处理")
+    各步骤是流水线（pipeline.SalaryPipeline）的阶段；cache/mailer/session 由常驻调度传入，
+    跨轮复用，单次运行时均按环境变量新建
+    """
+    # 延迟导入：pipeline 依赖本模块的各个步骤函数
+    from pipeline import SalaryPipeline, CHECK_STAGES
 
+    print("▶ 开始工资核对流程...")
+    stages = CHECK_STAGES + ('persist',) if persist else CHECK_STAGES
+    SalaryPipeline(pat, months, job='check', cache=cache, session=session, mailer=mailer).run(stages)
     print("✅ 工资核对流程结束。")
 
 # 使用示例
@@ -548,4 +615,9 @@ if __name__ == "__main__":
     if not github_pat:
         print("asd")
         raise ValueError("请设置 GITHUB_PAT 环境变量")
-    run_salary_check_process(github_pat)
+    if '--daemon' in sys.argv[1:] or os.getenv("SALARY_CHECK_DAEMON", '') in ('1', 'true', 'yes'):
+        # 常驻调度模式：按 SCHEDULE_CRON 定时核对，并在同一轮写出快照
+        from scheduler import SalaryCheckDaemon
+        SalaryCheckDaemon(github_pat).run()
+    else:
+        run_salary_check_process(github_pat)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from filter_rules import load_filter_rules
+from time_window import localize_times
+
+
+# 工资表中流水线实际使用的列（顺序与 salary_snapshot.json 一致），其余列在读取时直接丢弃
+SALARY_COLUMNS = ['BG', '部门', '基地', '项目组', '工资月份', '上传人', '上传时间',
+                  '终版上传人', '终版上传时间', '是否推送', '发薪日', '是否核对', '锁定状态']
+# 按字符串处理的列（空值保留为缺失值，不再变成字符串 'nan'）
+STRING_COLUMNS = ['BG', '部门', '基地', '项目组', '上传人', '终版上传人']
+# 存为 category 的列（每个取值只存一份，行内只存整数编码），从解析一直保持到合并、分类；
+# 项目组本身很少重复，但作为合并键按编码连接
+CATEGORY_COLUMNS = ['BG', '部门', '基地', '项目组', '上传人', '终版上传人', '成本是否核对', '核对人']
+# 成本核对状态编码
+COST_STATUS_MAP = {
+    None: '未核对',
+    0: '未核对',
+    1: '已通过',
+    2: '否',
+    '0': '未核对',
+    '1': '已通过',
+    '2': '否'
+}
+
+
+NAN = float('nan')
+
+
+def _as_str(value):
+    return None if value is None else str(value)
+
+
+def categorize(df, columns=None):
+    """
+    把字符串列转为 category（原地修改，已是 category 的列跳过）
+
+    参数:
+        df (pd.DataFrame): 工资数据
+        columns (list): 需要转换的列，默认 CATEGORY_COLUMNS（不存在的列忽略）
+
+    返回:
+        pd.DataFrame: 同一个 df
+    """
+    for col in columns or CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _find_header(rows):
+    """
+    在前两行中定位表头（部分导出文件第一行是标题，第二行才是列名）
+
+    返回:
+        tuple: (表头列表, 剩余行迭代器)
+    """
+    for _ in range(2):
+        header = next(rows, None)
+        if header is None:
+            break
+        if 'BG' in header:
+            return list(header), rows
+    raise ValueError("工资表中未找到包含 BG 的表头行")
+
+
+def read_salary_workbook(content, sheet_name="Sheet0", columns=None, rules=None):
+    """
+    以只读流式方式读取工资表Excel，逐行完成类型转换和项目组过滤
+
+    参数:
+        content (bytes/file): Excel二进制内容，或可 seek 的文件对象（如流式下载的临时缓冲）
+        sheet_name (str): 工作表名称
+        columns (list): 需要保留的列，默认 SALARY_COLUMNS
+        rules (FilterRules): 项目组/基地过滤规则，默认读取 filter_rules.json
+
+    返回:
+        pd.DataFrame: 与 get_salary_data 原处理结果一致的数据（'是否核对' 已重命名为 '成本是否核对'）；
+                      字符串空值为缺失值，CATEGORY_COLUMNS 中的列为 category
+    """
+    columns = columns or SALARY_COLUMNS
+    source = BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    wb = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        header, rows = _find_header(ws.iter_rows(values_only=True))
+
+        # 只记录需要的列在原表中的位置
+        positions = [(col, header.index(col)) for col in columns if col in header]
+        string_cols = set(STRING_COLUMNS)
+        # 规则每轮编译一次，每个不同的项目组/基地取值只判断一次
+        keep = (rules or load_filter_rules()).row_filter(header)
+
+        data = {col: [] for col, _ in positions}
+        indices = [idx for _, idx in positions]
+        for row in rows:
+            # 只读模式会返回带格式的空白行（如表尾设置过样式的行），保留的列全为空时跳过
+            if all(row[idx] is None for idx in indices if idx < len(row)):
+                continue
+            # 逐行过滤：默认排除共享中心/劳务派遣/招聘中台平台项目组和总部职能基地
+            if not keep(row):
+                continue
+
+            for col, idx in positions:
+                value = row[idx] if idx < len(row) else None
+                if col in string_cols:
+                    value = _as_str(value)
+                elif col == '是否核对':
+                    value = COST_STATUS_MAP.get(value, value)
+                elif value is None:
+                    # 与 read_excel 一致：空单元格记为 NaN，数值列保持数值类型
+                    value = NAN
+                data[col].append(value)
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(data, columns=[col for col, _ in positions])
+    # 时间列整列转换，比逐行解析快得多
+    df['工资月份'] = pd.to_datetime(df['工资月份'])
+    df['上传时间'] = pd.to_datetime(df['上传时间'])
+    df['终版上传时间'] = pd.to_datetime(df['终版上传时间'], errors='coerce')  # 处理可能的空值
+    # 上传时间是北京时间，读入时即标记时区
+    localize_times(df)
+    return categorize(df.rename(columns={'是否核对': '成本是否核对'}))
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+多月份工资数据：月份范围解析、按月缓存、有界并发拉取
+
+月末常有两个月的工资同时在途，财务也会要求回查更早的月份。一次运行可以拉取多个
+saMonth 并合并处理；已关账的月份（早于最近 SALARY_OPEN_MONTHS 个月）拉取一次后
+只读本地缓存，不再请求工资接口。
+"""
+import os
+import time
+import hashlib
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+import metrics
+from salary_ingest import categorize
+from filter_rules import load_filter_rules
+from time_window import beijing_now, localize_times
+
+
+DEFAULT_CACHE_DIR = os.path.join('.cache', 'salary')
+# 最近几个月视为仍在核算中，每次都重新拉取
+DEFAULT_OPEN_MONTHS = 2
+DEFAULT_MAX_WORKERS = 3
+
+
+def _shift_month(month, delta):
+    year, mon = divmod(month.year * 12 + month.month - 1 + delta, 12)
+    return month.replace(year=year, month=mon + 1, day=1)
+
+
+def month_range(start, end):
+    """
+    闭区间内的全部月份
+
+    参数:
+        start (str): 起始月份，格式如'2023-05'
+        end (str): 结束月份（可早于起始月份，此时自动交换）
+
+    返回:
+        list[str]: 按时间顺序的月份列表
+    """
+    first = datetime.strptime(start, '%Y-%m')
+    last = datetime.strptime(end, '%Y-%m')
+    if first > last:
+        first, last = last, first
+    months = []
+    while first <= last:
+        months.append(first.strftime('%Y-%m'))
+        first = _shift_month(first, 1)
+    return months
+
+
+def parse_months(spec, default=None):
+    """
+    解析月份配置，如 '2023-03~2023-05,2023-08'
+
+    逗号分隔，每一项是单个月份或用 ~ 连接的范围；结果去重并按时间排序。
+
+    参数:
+        spec (str): 月份配置（为空时返回 default）
+        default (list[str]): 配置为空时的默认月份
+
+    返回:
+        list[str]: 月份列表
+    """
+    months = set()
+    for item in (spec or '').replace('，', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if '~' in item:
+            start, end = item.split('~', 1)
+            months.update(month_range(start.strip(), end.strip()))
+        else:
+            months.add(datetime.strptime(item, '%Y-%m').strftime('%Y-%m'))
+    return sorted(months) if months else list(default or [])
+
+
+def is_closed_month(month, today=None, open_months=None):
+    """月份是否已关账：早于最近 open_months 个工资月（上月及之前）"""
+    open_months = int(open_months if open_months is not None else
+                      os.getenv("SALARY_OPEN_MONTHS") or DEFAULT_OPEN_MONTHS)
+    # 按北京时间的当前月份判断；只比较月份，去掉时区
+    today = (today or beijing_now()).replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    oldest_open = _shift_month(today, -open_months)
+    return datetime.strptime(month, '%Y-%m') < oldest_open
+
+
+class SalaryMonthCache:
+    """
+    工资数据按月缓存（解析后的DataFrame，pickle）
+
+    每个月份（及工资接口地址）一个缓存文件，已关账的月份命中缓存后不再请求接口。
+
+    参数:
+        cache_dir (str): 缓存目录，默认读取 SALARY_CACHE_DIR（.cache/salary）
+        invalidate (bool): 是否忽略缓存强制重新拉取，默认读取 SALARY_CACHE_REFRESH
+    """
+
+    def __init__(self, cache_dir=None, invalidate=None):
+        self.cache_dir = cache_dir or os.getenv("SALARY_CACHE_DIR") or DEFAULT_CACHE_DIR
+        if invalidate is None:
+            invalidate = os.getenv("SALARY_CACHE_REFRESH", '') in ('1', 'true', 'yes')
+        self.invalidate = invalidate
+
+    def _path(self, month, source):
+        key = hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]
+        return os.path.join(self.cache_dir, f'{month}-{key}.pkl')
+
+    def load(self, month, source=''):
+        """读取某月的缓存，不存在或已失效时返回 None"""
+        path = self._path(month, source)
+        if self.invalidate or not os.path.exists(path):
+            return None
+        try:
+            # 旧缓存的上传时间不带时区，读入时统一为北京时间
+            return localize_times(pd.read_pickle(path))
+        except Exception as e:
+            print(f"读取 {month} 工资缓存失败，将重新拉取: {str(e)}")
+            return None
+
+    def store(self, month, df, source=''):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(month, source)
+        df.to_pickle(path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+
+def fetch_salary_months(months, loader, source='', max_workers=None, cache=None, today=None):
+    """
+    有界并发拉取多个月份的工资数据并合并
+
+    已关账且有缓存的月份直接读缓存；其余月份并发请求（并发数上限 max_workers），
+    成功后只缓存拉取时已关账的月份（在途月份的数据还会变化，缓存下来关账后会一直读到旧数据）。
+    任一月份失败时抛出 RuntimeError（由调用方决定是否降级）。
+
+    参数:
+        months (list[str]): 工资月份列表
+        loader (callable): 单月加载函数，如 load_salary_data
+        source (str): 数据源标识（工资接口地址），参与缓存键
+        max_workers (int): 并发请求上限，默认读取 SALARY_MAX_WORKERS（3）
+        cache (SalaryMonthCache): 按月缓存
+
+    返回:
+        pd.DataFrame: 各月份数据按月份顺序拼接
+    """
+    cache = cache or SalaryMonthCache()
+    run = metrics.current()
+    frames = {}
+    pending = []
+    closed = {month for month in months if is_closed_month(month, today)}
+    for month in months:
+        cached = cache.load(month, source) if month in closed else None
+        if cached is not None:
+            # 缓存是按当时的规则过滤的，规则文件修改后按新规则再过滤一次（按类别判断，开销很小）
+            frames[month] = load_filter_rules().apply(cached)
+            run.add('salary_months_cached')
+        else:
+            pending.append(month)
+
+    if pending:
+        workers = int(max_workers or os.getenv("SALARY_MAX_WORKERS") or DEFAULT_MAX_WORKERS)
+        errors = {}
+
+        def timed(month):
+            start = time.perf_counter()
+            df = loader(month)
+            return df, time.perf_counter() - start
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(pending)), thread_name_prefix='salary') as executor:
+            futures = {executor.submit(timed, month): month for month in pending}
+            for future in as_completed(futures):
+                month = futures[future]
+                try:
+                    df, seconds = future.result()
+                except Exception as e:
+                    errors[month] = str(e)
+                    continue
+                run.record_stage(f'fetch:salary:{month}', seconds, rows=len(df))
+                frames[month] = df
+                if month in closed:
+                    cache.store(month, df, source)
+        if errors:
+            raise RuntimeError('；'.join(f"{month}: {error}" for month, error in sorted(errors.items())))
+
+    print(f" - 工资月份 {','.join(months)}：缓存 {len(months) - len(pending)} 个，拉取 {len(pending)} 个")
+    ordered = [frames[month] for month in months if not frames[month].empty]
+    if not ordered:
+        return pd.DataFrame()
+    # 各月的 category 类别不同，拼接后会退化为 object，需重新编码
+    return categorize(pd.concat(ordered, ignore_index=True))
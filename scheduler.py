@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+常驻调度：进程常驻，按 cron 表达式（北京时间）定时执行工资核对
+
+与每小时一次的 workflow_dispatch 冷启动相比，导入的模块、HTTP会话、GitHub文件缓存、
+SMTP发送池在各轮之间保持；每轮在核对后直接写出状态快照，不再另起数据刷新流程重复拉取。
+SMTP会话只在空闲不超过 SMTP_IDLE_TIMEOUT（240秒）时复用：按默认每半小时一轮调度时，
+每轮仍会重新登录（服务器也会断开空闲过久的会话），同一轮内的发件箱重试则共用已登录的会话。
+
+用法:
+    python salary_check.py --daemon
+    SCHEDULE_CRON="0,30 * * * *" python salary_check.py --daemon
+"""
+import os
+import signal
+import threading
+from datetime import datetime, timedelta
+
+from time_window import SCHEDULED_TIMES, SCHEDULED_TOLERANCE, NEAR_HOUR_MINUTES, beijing_now
+from http_client import HttpClient
+from github_cache import GitHubExcelCache
+from mail_sender import MailerPool
+
+
+# 默认每半小时一次：覆盖 09:00 定时报告、整点前后的核对人提醒窗口和 BG 的 30 分钟上传窗口
+DEFAULT_CRON = '0,30 * * * *'
+# 单次等待的上限（秒），便于及时响应退出信号和系统时间调整
+_MAX_SLEEP = 60
+
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(text, low, high):
+    values = set()
+    for part in text.split(','):
+        part, _, step = part.partition('/')
+        step = int(step) if step else 1
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-', 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"cron 字段超出范围: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    五段式 cron 表达式（分 时 日 月 周），支持 *、a-b、a,b、*/n；周日为 0 或 7
+
+    日与周都不是 * 时按标准 cron 语义取并集。
+    """
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式应为 5 段（分 时 日 月 周）: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(field, low, high) for field, (low, high) in zip(fields, _FIELD_RANGES))
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def matches(self, moment):
+        if moment.minute not in self.minutes or moment.hour not in self.hours or moment.month not in self.months:
+            return False
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment):
+        """严格晚于 moment 的下一个触发时刻（精确到分钟）"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # 最多向后查找 4 年（覆盖 2 月 29 日这类表达式）
+        for _ in range(4 * 366 * 24 * 60):
+            if self.matches(candidate):
+                return candidate
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            else:
+                candidate += timedelta(minutes=1)
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expression}")
+
+    def uncovered_windows(self):
+        """检查一天内是否覆盖 09:00±10 分钟的定时报告和整点±5 分钟的提醒窗口，返回未覆盖的说明"""
+        day = datetime(2024, 1, 1)
+        fired = [day + timedelta(minutes=m) for m in range(24 * 60) if self.matches(day + timedelta(minutes=m))]
+        missing = []
+        for hour, minute in SCHEDULED_TIMES:
+            if not any(abs(t - day.replace(hour=hour, minute=minute)) <= SCHEDULED_TOLERANCE for t in fired):
+                missing.append(f'{hour:02d}:{minute:02d} 定时报告')
+        if not any(t.minute <= NEAR_HOUR_MINUTES or t.minute >= 60 - NEAR_HOUR_MINUTES for t in fired):
+            missing.append('整点核对人提醒')
+        return missing
+
+
+class SalaryCheckDaemon:
+    """
+    常驻工资核对调度器
+
+    参数:
+        pat (str): GitHub个人访问令牌
+        cron (str): 调度表达式（北京时间），默认读取 SCHEDULE_CRON（每半小时）
+        run_on_start (bool): 启动后是否先立即执行一轮，默认读取 SCHEDULE_RUN_ON_START
+    """
+
+    def __init__(self, pat, cron=None, run_on_start=None):
+        self.pat = pat
+        self.schedule = CronSchedule(cron or os.getenv("SCHEDULE_CRON") or DEFAULT_CRON)
+        if run_on_start is None:
+            run_on_start = os.getenv("SCHEDULE_RUN_ON_START", '') in ('1', 'true', 'yes')
+        self.run_on_start = run_on_start
+        # 跨轮保持的资源
+        self.session = HttpClient()
+        self.cache = GitHubExcelCache(session=self.session)
+        self.mailer = MailerPool()
+        self.ticks = 0
+        self._stop = threading.Event()
+
+    def stop(self, *_):
+        print("收到退出信号，本轮结束后退出")
+        self._stop.set()
+
+    def tick(self):
+        """执行一轮核对（异常只记录，不中断调度）"""
+        # 延迟到首轮再导入，避免 salary_check 以脚本方式运行时的循环导入
+        from salary_check import run_salary_check_process
+
+        self.ticks += 1
+        print(f"⏰ 第 {self.ticks} 轮调度：{beijing_now():%Y-%m-%d %H:%M:%S}")
+        try:
+            run_salary_check_process(self.pat, cache=self.cache, mailer=self.mailer, session=self.session)
+        except Exception as e:
+            print(f"本轮工资核对失败: {str(e)}")
+        finally:
+            self.mailer.reset()
+        # 常驻期间累计的请求耗时（含重试等待），便于发现工资接口变慢
+        for name, stats in self.session.latency_summary().items():
+            print(f"请求耗时 {name}：{stats['count']} 次，p50 {stats['p50']:.2f}s，"
+                  f"p95 {stats['p95']:.2f}s，最大 {stats['max']:.2f}s")
+
+    def run(self, max_ticks=None):
+        """
+        按调度循环执行，直到收到 SIGINT/SIGTERM 或达到 max_ticks 轮
+
+        参数:
+            max_ticks (int): 最多执行的轮数（调试用），默认不限
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        missing = self.schedule.uncovered_windows()
+        if missing:
+            print(f"⚠ 调度表达式 {self.schedule.expression} 未覆盖：{'、'.join(missing)}")
+        print(f"常驻调度已启动：{self.schedule.expression}（北京时间）")
+
+        try:
+            if self.run_on_start:
+                self.tick()
+            while not self._stop.is_set() and (max_ticks is None or self.ticks < max_ticks):
+                due = self.schedule.next_after(beijing_now())
+                print(f"下一轮：{due:%Y-%m-%d %H:%M}")
+                while not self._stop.is_set():
+                    remaining = (due - beijing_now()).total_seconds()
+                    if remaining <= 0:
+                        break
+                    self._stop.wait(min(remaining, _MAX_SLEEP))
+                    # 等待期间关闭空闲过久的SMTP会话（服务器迟早会断开，不必占着）
+                    self.mailer.close_idle()
+                if not self._stop.is_set():
+                    self.tick()
+        finally:
+            self.close()
+
+    def close(self):
+        self.mailer.close()
+        self.session.close()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+
+SNAPSHOT_FORMAT = 'salary-snapshot'
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = 'salary_snapshot.json'
+# 旧版快照（to_json(orient='records')），新快照不存在时回退读取
+LEGACY_SNAPSHOT_PATH = 'output.json'
+LEGACY_TIME_COLUMNS = ['工资月份', '上传时间', '终版上传时间', 'creation_time']
+
+
+def _column_type(series):
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_integer_dtype(series):
+        return 'int'
+    if pd.api.types.is_float_dtype(series):
+        return 'float'
+    return 'string'
+
+
+def _encode_column(name, series):
+    """字典编码单列：values 为去重后的取值，codes 为每行在 values 中的位置（-1 表示空值）"""
+    kind = _column_type(series)
+    codes, uniques = pd.factorize(series)
+    column = {'name': name, 'type': kind}
+    if kind == 'datetime':
+        uniques = pd.DatetimeIndex(uniques)
+        if uniques.tz is not None:
+            # 带时区的时间按当地时间保存（与旧快照不带时区的北京时间一致），时区另记在 tz 中
+            column['tz'] = str(uniques.tz)
+            uniques = uniques.tz_localize(None)
+        # 统一存为毫秒时间戳，不依赖 pandas 内部的时间精度
+        values = [int(ts.value // 1_000_000) for ts in uniques]
+    else:
+        values = [value.item() if hasattr(value, 'item') else value for value in uniques]
+    column.update(values=values, codes=codes.tolist())
+    return column
+
+
+def _decode_column(column):
+    codes = np.asarray(column['codes'], dtype=np.int64)
+    missing = codes < 0
+    kind = column['type']
+    if kind == 'datetime':
+        values = pd.to_datetime(np.asarray(column['values'], dtype='int64'), unit='ms').to_numpy()
+        out = values[np.where(missing, 0, codes)] if len(values) else np.empty(len(codes), dtype='datetime64[ns]')
+        out[missing] = np.datetime64('NaT')
+        series = pd.Series(out, name=column['name'])
+        return series.dt.tz_localize(column['tz']) if column.get('tz') else series
+    if kind in ('int', 'float', 'bool'):
+        dtype = {'int': 'int64', 'float': 'float64', 'bool': 'bool'}[kind]
+        values = np.asarray(column['values'], dtype=dtype)
+        if missing.any() or not len(values):
+            # 有空值的整数/布尔列与 read_json 一致，读回为浮点/对象
+            values = values.astype('float64' if kind != 'bool' else object)
+            out = np.full(len(codes), np.nan if kind != 'bool' else None, dtype=values.dtype)
+            out[~missing] = values[codes[~missing]]
+        else:
+            out = values[codes]
+        return pd.Series(out, name=column['name'])
+    values = np.asarray(column['values'], dtype=object)
+    out = np.full(len(codes), None, dtype=object)
+    out[~missing] = values[codes[~missing]]
+    return pd.Series(out, name=column['name'], dtype=object)
+
+
+def write_snapshot(df, path=None):
+    """
+    以列存储+字典编码的版本化JSON写出快照
+
+    结构:
+        {"format": "salary-snapshot", "version": 1, "rows": N,
+         "columns": [{"name", "type", "values", "codes"}, ...]}
+    字符串只保存一次取值，时间列保存为毫秒时间戳（带时区的列按当地时间保存，并记录 tz），中文不再转义。
+
+    参数:
+        df (pd.DataFrame): 合并后的工资数据
+        path (str): 写出路径，默认读取 SNAPSHOT_PATH（salary_snapshot.json）
+
+    返回:
+        str: 实际写出的路径
+    """
+    path = path or os.getenv("SNAPSHOT_PATH") or DEFAULT_SNAPSHOT_PATH
+    payload = {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'rows': len(df),
+        'columns': [_encode_column(name, df[name]) for name in df.columns],
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def resolve_snapshot_path(path=None):
+    """快照路径：默认读取 SNAPSHOT_PATH（salary_snapshot.json），不存在时回退旧版 output.json"""
+    if path is None:
+        path = os.getenv("SNAPSHOT_PATH") or DEFAULT_SNAPSHOT_PATH
+        if not os.path.exists(path) and os.path.exists(LEGACY_SNAPSHOT_PATH):
+            path = LEGACY_SNAPSHOT_PATH
+    return path
+
+
+def read_snapshot(path=None):
+    """
+    读取快照为 DataFrame，时间列直接还原为 datetime64
+
+    兼容旧版 output.json（records 格式）：新快照不存在时自动回退读取旧文件。
+
+    参数:
+        path (str): 快照路径，默认读取 SNAPSHOT_PATH（salary_snapshot.json）
+
+    返回:
+        pd.DataFrame: 快照数据；文件不存在时返回 None
+    """
+    path = resolve_snapshot_path(path)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        payload = json.load(f)
+
+    if isinstance(payload, list):
+        return _from_legacy_records(payload)
+    if payload.get('format') != SNAPSHOT_FORMAT or payload.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"不支持的快照格式: {payload.get('format')} v{payload.get('version')}")
+    columns = [_decode_column(column) for column in payload['columns']]
+    if not columns:
+        return pd.DataFrame()
+    return pd.concat(columns, axis=1)
+
+
+def _from_legacy_records(records):
+    df = pd.DataFrame.from_records(records)
+    for col in LEGACY_TIME_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
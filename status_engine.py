@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from time_window import to_beijing, uploaded_since
+
+
+# 核对进度状态：每行恰好属于其中一个
+PROGRESS_STATUSES = ['待核对（新提交）', '待核对（历史未完成）', '已完成', '未提交']
+# 成本状态：仅待核对的行可能带有，与进度状态同时存在
+COST_STATUSES = ['成本未确认', '成本未通过']
+
+# 报告分节：(标题, 状态列, 状态值)，顺序即邮件中的展示顺序
+REPORT_SECTIONS = [
+    ('成本未确认的', '成本状态', '成本未确认'),
+    ('成本未通过的', '成本状态', '成本未通过'),
+    ('待核对（新提交）', '状态', '待核对（新提交）'),
+    ('待核对（历史未完成）', '状态', '待核对（历史未完成）'),
+    ('已完成', '状态', '已完成'),
+    ('未提交', '状态', '未提交'),
+]
+
+CLASSIFY_COLUMNS = ['BG', '部门', '基地', '项目组', '工资月份',
+                    '上传时间', '终版上传时间', '核对人', '成本是否核对']
+DISPLAY_COLUMNS = ['BG', '部门', '基地', '项目组', '工资月份',
+                   '上传时间', '终版上传时间', '状态', '核对人']
+
+
+def classify_records(final_df, time_threshold, changes=None, recent_since=None):
+    """
+    单次向量化计算每行的核对状态
+
+    一行同时属于两个分节（如“成本未确认”且“待核对”）时不复制数据行，
+    而是用两列分别记录：
+    - 状态：进度状态（待核对（新提交）/待核对（历史未完成）/已完成/未提交），每行必有
+    - 成本状态：成本未确认/成本未通过，仅待核对的行可能有值，其余为空；
+      完全重复的行只有第一行带成本状态（原实现对成本分节做了去重）
+
+    参数:
+        final_df (pd.DataFrame): 合并核对人后的工资数据
+        time_threshold (datetime): “新提交”的上传时间下限（按时间窗口判断时使用，不带时区时按北京时间解释）
+        changes (pd.DataFrame): detect_changes 的结果；传入时“新提交”改为按上次快照以来的
+                                真实上传变化判断，并增加“有变化”列
+        recent_since (datetime): 传入时增加“近期上传”列（上传时间不早于该时间），
+                                 供 BG 成本未确认提醒直接按组取用，不再逐组比较时间
+
+    返回:
+        pd.DataFrame: 只含报告所需列的数据，状态两列为 category 类型，上传时间/终版上传时间为北京时间，
+                      其余列与 final_df 共用数据（category 列保持 category）
+    """
+    # 只引用所需列，不复制数据；时间列已是北京时间时不再转换
+    df = pd.DataFrame({col: final_df[col] for col in CLASSIFY_COLUMNS if col in final_df.columns},
+                      index=final_df.index, copy=False)
+    if not pd.api.types.is_datetime64_any_dtype(df['工资月份']):
+        df['工资月份'] = pd.to_datetime(df['工资月份'], errors='coerce')
+    for col in ['上传时间', '终版上传时间']:
+        df[col] = to_beijing(df[col])
+
+    # 上传时间为空的行与阈值比较结果均为 False
+    uploaded = df['上传时间']
+    not_final = df['终版上传时间'].isna().to_numpy()
+    if changes is None:
+        is_recent = uploaded_since(uploaded, time_threshold)
+    else:
+        is_recent = changes['新上传'].reindex(df.index, fill_value=False).to_numpy(dtype=bool)
+    waiting = not_final & uploaded.notna().to_numpy()
+    recent = waiting & is_recent
+    pending = waiting & ~is_recent
+
+    # 进度状态互斥：新提交 / 历史未完成 / 已完成 / 未提交
+    progress_codes = np.select(
+        [recent, pending, ~not_final],
+        [0, 1, 2],
+        default=3
+    ).astype(np.int8)
+    df['状态'] = pd.Categorical.from_codes(progress_codes, categories=PROGRESS_STATUSES)
+
+    # 成本状态只针对待核对的行
+    waiting = recent | pending
+    if '成本是否核对' in df.columns:
+        # category 列直接按编码比较，不展开为对象数组
+        cost = df['成本是否核对']
+        cost_codes = np.select(
+            [waiting & (cost == '未核对').to_numpy(), waiting & (cost == '否').to_numpy()],
+            [0, 1],
+            default=-1
+        ).astype(np.int8)
+    else:
+        cost_codes = np.full(len(df), -1, dtype=np.int8)
+    # 与原实现一致：成本分节去掉完全重复的行（只显示一次），进度分节保留
+    has_cost = cost_codes >= 0
+    if has_cost.any():
+        duplicated = final_df[has_cost].duplicated().to_numpy()
+        if duplicated.any():
+            cost_codes[np.flatnonzero(has_cost)[duplicated]] = -1
+    df['成本状态'] = pd.Categorical.from_codes(cost_codes, categories=COST_STATUSES)
+
+    if changes is not None:
+        df['有变化'] = changes.reindex(df.index, fill_value=False).any(axis=1).to_numpy()
+    if recent_since is not None:
+        df['近期上传'] = uploaded_since(uploaded, recent_since)
+    return df
+
+
+def iter_sections(df):
+    """
+    按 REPORT_SECTIONS 顺序遍历报告分节（跳过空分节）
+
+    成本分节内的行按进度状态排序（新提交在前），与原先先拼新提交、再拼历史未完成的顺序一致。
+
+    返回:
+        generator: (标题, 状态值, 分节数据)
+    """
+    for title, column, label in REPORT_SECTIONS:
+        rows = df[df[column] == label]
+        if rows.empty:
+            continue
+        if column == '成本状态':
+            rows = rows.sort_values('状态', kind='stable')
+        yield title, label, rows
+
+
+def format_section(rows, label):
+    """
+    生成分节的展示数据：时间列格式化为字符串，状态列填入该分节的状态值
+    """
+    time_format = '%Y-%m-%d %H:%M'
+    display = pd.DataFrame({
+        'BG': rows['BG'],
+        '部门': rows['部门'],
+        '基地': rows['基地'],
+        '项目组': rows['项目组'],
+        '工资月份': rows['工资月份'].dt.strftime('%Y-%m'),
+        '上传时间': rows['上传时间'].dt.strftime(time_format),
+        '终版上传时间': rows['终版上传时间'].dt.strftime(time_format),
+        '状态': label,
+        '核对人': rows['核对人'],
+    }, columns=DISPLAY_COLUMNS)
+    return display
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+合成工资数据：工资表、核对人表、邮箱维护表（基准测试与离线演练使用）
+
+规模以当前快照为基准：scale=1 约 235 行有效工资记录、8 个核对人、3 个BG。
+"""
+import random
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+
+import time_window
+from salary_ingest import SALARY_COLUMNS, categorize
+
+
+BGS = ['互联网BG', '运营商BG', '金融BG']
+BASES = ['石家庄财金职场', '肇庆职场', '邯郸职场', '保定职场']
+EXCLUDED_BASE = '总部职能'
+PROJECT_SUFFIXES = ['服务项目', '电话营销项目', '在线客服项目', '工单项目']
+EXCLUDED_SUFFIXES = ['共享中心', '劳务派遣', '招聘中台平台']
+
+BASE_ROWS = 235
+BASE_CHECKERS = 8
+
+
+def beijing_now():
+    """当前北京时间（不带时区，与上游表格中的时间一致）"""
+    return time_window.beijing_now().replace(tzinfo=None)
+
+
+def generate_payroll_records(rows, seed=0, now=None, excluded_ratio=0.15):
+    """
+    生成工资接口返回的原始记录（'是否核对' 为 0/1/2/空 编码）
+
+    参数:
+        rows (int): 记录数（含会被过滤掉的项目组）
+        seed (int): 随机种子
+        now (datetime): 基准时间，上传时间分布在其前 10 天内
+        excluded_ratio (float): 共享中心/劳务派遣/总部职能等应被排除的记录比例
+
+    返回:
+        list[dict]: 以 SALARY_COLUMNS 为键的记录
+    """
+    rng = random.Random(seed)
+    now = now or beijing_now()
+    month = (now.replace(day=1) - timedelta(days=1)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    records = []
+    for i in range(rows):
+        excluded = rng.random() < excluded_ratio
+        base = EXCLUDED_BASE if excluded and rng.random() < 0.3 else rng.choice(BASES)
+        suffix = rng.choice(EXCLUDED_SUFFIXES) if excluded and base != EXCLUDED_BASE else rng.choice(PROJECT_SUFFIXES)
+        uploaded = rng.random() < 0.7
+        finalized = uploaded and rng.random() < 0.5
+        upload_time = now - timedelta(minutes=rng.randint(90, 60 * 24 * 10)) if uploaded else None
+        upload_time = upload_time.replace(microsecond=0) if upload_time else None
+        records.append({
+            'BG': rng.choice(BGS),
+            '部门': f'业务{rng.randint(1, 9)}部',
+            '基地': base,
+            '项目组': f'项目{i}-{suffix}',
+            '工资月份': month,
+            '上传人': f'员工{rng.randint(1, 500)}' if uploaded else None,
+            '上传时间': upload_time,
+            '终版上传人': f'员工{rng.randint(1, 500)}' if finalized else None,
+            '终版上传时间': upload_time + timedelta(hours=rng.randint(1, 48)) if finalized else None,
+            '是否推送': None,
+            '发薪日': rng.choice([10, 15, 18]),
+            '是否核对': rng.choice([0, 1, 2, None]),
+            '锁定状态': rng.choice([0, 2]),
+        })
+    return records
+
+
+def add_edge_cases(records, seed=0, now=None, ratio=0.2):
+    """
+    在工资记录中混入容易出错的情况（用于新旧实现等价性校验）
+
+    - 最近 2 小时内的上传（含恰好落在 1.1 小时阈值、30 分钟阈值上的），覆盖“新提交”和BG提醒
+    - BG/部门/基地/项目组为空
+    - 多个工资月份
+    - '是否核对' 为字符串编码 '0'/'1'/'2'
+    - 项目组重复（同一项目组多行）与完全重复的行
+
+    返回:
+        list[dict]: 新的记录列表（原列表不变）
+    """
+    rng = random.Random(seed)
+    now = (now or beijing_now()).replace(microsecond=0)
+    edge = []
+    for record in records:
+        record = dict(record)
+        if rng.random() < ratio:
+            case = rng.randrange(7)
+            if case == 0:
+                record['上传时间'] = now - timedelta(minutes=rng.choice([0, 10, 29, 30, 31, 65, 66, 67, 119]))
+                record['上传人'] = record['上传人'] or f'员工{rng.randint(1, 500)}'
+                record['终版上传时间'] = None
+                record['终版上传人'] = None
+            elif case == 1:
+                record[rng.choice(['BG', '部门', '基地', '项目组'])] = None
+            elif case == 2:
+                month = record['工资月份']
+                record['工资月份'] = (month - timedelta(days=1)).replace(day=1)
+            elif case == 3:
+                record['是否核对'] = rng.choice(['0', '1', '2'])
+            elif case == 4 and edge:
+                record['项目组'] = rng.choice(edge)['项目组']
+            elif case == 5 and edge:
+                edge.append(dict(rng.choice(edge)))
+            else:
+                record['上传时间'] = None
+                record['上传人'] = None
+                record['终版上传时间'] = None
+                record['终版上传人'] = None
+        edge.append(record)
+    return edge
+
+
+def advance_payroll(records, fraction=0.05, seed=1, now=None):
+    """
+    模拟一段时间后的工资表：部分未上传的记录新上传，部分待核对的记录上传终版
+
+    返回:
+        list[dict]: 新的记录列表（原列表不变）
+    """
+    rng = random.Random(seed)
+    now = now or beijing_now()
+    advanced = []
+    for record in records:
+        record = dict(record)
+        if rng.random() < fraction:
+            if record['上传时间'] is None:
+                record['上传人'] = f'员工{rng.randint(1, 500)}'
+                record['上传时间'] = (now - timedelta(minutes=rng.randint(1, 20))).replace(microsecond=0)
+                record['是否核对'] = 0
+            elif record['终版上传时间'] is None:
+                record['终版上传人'] = f'员工{rng.randint(1, 500)}'
+                record['终版上传时间'] = (now - timedelta(minutes=rng.randint(1, 20))).replace(microsecond=0)
+        advanced.append(record)
+    return advanced
+
+
+def records_to_workbook(records, sheet_name='Sheet0', title_row=False):
+    """把工资记录写成工资接口返回的xlsx"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    if title_row:
+        ws.append(['工资上传情况'] + [None] * (len(SALARY_COLUMNS) - 1))
+    ws.append(SALARY_COLUMNS)
+    for record in records:
+        ws.append([record[col] for col in SALARY_COLUMNS])
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def build_salary_workbook(rows, seed=0, title_row=False, now=datetime(2026, 7, 10, 8, 0)):
+    """
+    生成与工资接口返回格式一致的合成工资表（Sheet0）
+
+    参数:
+        rows (int): 数据行数
+        seed (int): 随机种子，保证结果可复现
+        title_row (bool): 是否在表头前加一行标题（模拟部分导出格式）
+
+    返回:
+        bytes: xlsx二进制内容
+    """
+    return records_to_workbook(generate_payroll_records(rows, seed, now), title_row=title_row)
+
+
+def _sheet1_workbook(columns, rows):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
+    ws.append(columns)
+    for row in rows:
+        ws.append(row)
+    out = BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def checker_names(count):
+    return [f'核对人{i}' for i in range(count)]
+
+
+def build_checker_workbook(records, checkers, seed=0, unassigned_ratio=0.05, duplicate_ratio=0.0):
+    """
+    生成“工资核算人统计.xlsx”：项目 -> 工资核对人（少量项目不分配核对人）
+
+    duplicate_ratio > 0 时部分项目重复出现并分给另一个核对人（合并时一行工资记录对应多个核对人）
+    """
+    rng = random.Random(seed)
+    rows = []
+    seen = set()
+    for record in records:
+        project = record['项目组']
+        if project is None or project in seen or rng.random() < unassigned_ratio:
+            continue
+        seen.add(project)
+        rows.append((project, rng.choice(checkers)))
+        if duplicate_ratio and rng.random() < duplicate_ratio:
+            rows.append((project, rng.choice(checkers)))
+    return _sheet1_workbook(['项目', '工资核对人'], rows)
+
+
+def build_email_workbook(checkers, bgs=BGS, seed=0, missing_ratio=0.05, bg_from_checkers=False):
+    """
+    生成“邮箱维护.xlsx”：核对人/BG -> 邮箱（部分核对人有两个邮箱，少量缺失）
+
+    bg_from_checkers=True 时每个BG的联系人是某个核对人本人（与其共用全部邮箱）
+    """
+    rng = random.Random(seed)
+    rows = []
+    addresses = {}
+    for i, name in enumerate(list(checkers) + list(bgs)):
+        if bg_from_checkers and name in bgs and checkers:
+            owner = rng.choice(list(checkers))
+            rows.extend((name, addr) for addr in addresses.get(owner, []))
+            continue
+        if rng.random() < missing_ratio:
+            continue
+        addresses[name] = [f'user{i}@example.com']
+        if rng.random() < 0.3:
+            addresses[name].append(f'user{i}.backup@example.com')
+        rows.extend((name, addr) for addr in addresses[name])
+    return _sheet1_workbook(['核对人', '邮箱'], rows)
+
+
+def generate_dataset(scale=1.0, seed=0, now=None, edge_cases=False):
+    """
+    按规模生成一整套上游数据（同一 scale/seed/now 的结果完全相同）
+
+    参数:
+        scale (float): 相对当前快照的规模倍数（1 ~ 500，约 235 行/倍）
+        seed (int): 随机种子
+        now (datetime): 基准时间（北京时间）
+        edge_cases (bool): 是否混入边界情况（见 add_edge_cases），核对人表中部分项目重复、BG联系人兼任核对人
+
+    返回:
+        dict: records（工资记录）、checkers（核对人名单）、checker_xlsx、email_xlsx
+    """
+    rows = max(1, round(BASE_ROWS * scale / 0.85))
+    checkers = checker_names(max(1, round(BASE_CHECKERS * scale)))
+    records = generate_payroll_records(rows, seed, now)
+    if edge_cases:
+        records = add_edge_cases(records, seed, now)
+    return {
+        'records': records,
+        'checkers': checkers,
+        'checker_xlsx': build_checker_workbook(records, checkers, seed,
+                                               duplicate_ratio=0.05 if edge_cases else 0.0),
+        'email_xlsx': build_email_workbook(checkers, seed=seed, bg_from_checkers=edge_cases),
+    }
+
+
+def build_final_frame(rows, seed=0, now=datetime(2026, 7, 10, 9, 0)):
+    """
+    直接生成合并核对人之后的数据（跳过Excel读写，用于分类/渲染基准）
+
+    返回:
+        pd.DataFrame: 与 merge_data_by_project 输出列一致的数据
+    """
+    rng = random.Random(seed)
+    checkers = checker_names(40) + [None]
+    records = []
+    for i in range(rows):
+        uploaded = rng.random() < 0.7
+        finalized = uploaded and rng.random() < 0.5
+        upload_time = now - timedelta(minutes=rng.randint(0, 60 * 24 * 3)) if uploaded else None
+        records.append({
+            'BG': rng.choice(BGS),
+            '部门': f'业务{rng.randint(1, 9)}部',
+            '基地': rng.choice(BASES[:3]),
+            '项目组': f'项目{i}',
+            '工资月份': datetime(2026, 6, 1),
+            '上传人': f'员工{rng.randint(1, 500)}' if uploaded else None,
+            '上传时间': upload_time,
+            '终版上传人': None,
+            '终版上传时间': upload_time + timedelta(hours=rng.randint(1, 48)) if finalized else None,
+            '是否推送': None,
+            '发薪日': rng.choice([10, 15, 18]),
+            '成本是否核对': rng.choice(['未核对', '已通过', '否']),
+            '锁定状态': rng.choice([0, 2]),
+            '核对人': rng.choice(checkers),
+        })
+    df = pd.DataFrame(records)
+    for col in ['工资月份', '上传时间', '终版上传时间']:
+        df[col] = pd.to_datetime(df[col])
+    return categorize(df)
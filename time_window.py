@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+北京时间与报告时间窗口：定时报告（09:00±10分钟）、整点核对人提醒（±5分钟）、
+“新提交”（最近 1.1 小时）与 BG 成本未确认提醒（最近 30 分钟）的上传时间判断
+
+所有时刻统一为 Asia/Shanghai 时区的带时区时间，不再用 datetime.now()+8小时 模拟：
+- 当前时间由 beijing_now() 取得；传入的不带时区时间按北京时间解释（上游表格、旧快照、测试数据均如此）
+- 上传时间、终版上传时间在读入时整列转为带 Asia/Shanghai 时区的 datetime64（localize_times），
+  之后只做向量化比较，到渲染时才格式化为字符串；工资月份是日历月份，保持不带时区
+
+本轮的窗口（report_window）每次运行只计算一次。模块本身只依赖标准库，命令行入口在导入
+pandas/requests 之前就能判断本轮是否可能发送邮件；处理 DataFrame 的函数在调用时才导入 pandas。
+"""
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+
+BEIJING_TZ = 'Asia/Shanghai'
+BEIJING = ZoneInfo(BEIJING_TZ)
+# 表示时刻的列（带时区）；工资月份不在其中
+INSTANT_COLUMNS = ['上传时间', '终版上传时间', 'creation_time']
+# 定时报告时间与允许误差、整点提醒的允许误差（分钟）
+SCHEDULED_TIMES = [(9, 0)]
+SCHEDULED_TOLERANCE = timedelta(minutes=10)
+NEAR_HOUR_MINUTES = 5
+# BG 成本未确认提醒只看最近 30 分钟内的上传（按时间窗口通知时）
+RECENT_UPLOAD_MINUTES = 30
+
+# 本轮报告的时间窗口：当前北京时间、是否为定时报告时间（09:00±10分钟）、是否为整点（±5分钟）
+ReportWindow = namedtuple('ReportWindow', ['now', 'is_scheduled_time', 'is_near_hour'])
+
+
+def beijing_now():
+    """当前北京时间（带时区）"""
+    return datetime.now(BEIJING)
+
+
+def as_beijing(moment):
+    """不带时区的时间视为北京时间，带时区的换算为北京时间"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=BEIJING)
+    return moment.astimezone(BEIJING)
+
+
+def report_window(now=None):
+    """计算本轮的报告时间窗口（北京时间）"""
+    now = beijing_now() if now is None else as_beijing(now)
+    is_scheduled_time = any(
+        abs(now - now.replace(hour=hour, minute=minute, second=0, microsecond=0)) <= SCHEDULED_TOLERANCE
+        for hour, minute in SCHEDULED_TIMES
+    )
+    # 检查当前时间是否为整点（允许±5分钟误差）
+    is_near_hour = (now.minute <= NEAR_HOUR_MINUTES) or (now.minute >= 60 - NEAR_HOUR_MINUTES)
+    return ReportWindow(now, is_scheduled_time, is_near_hour)
+
+
+def to_beijing(values):
+    """
+    时间列转为带 Asia/Shanghai 时区的 datetime64（已是北京时间时原样返回）
+
+    参数:
+        values (pd.Series): 时间或可解析为时间的列；不带时区的按北京时间解释，无法解析的记为 NaT
+
+    返回:
+        pd.Series: 带时区的时间列
+    """
+    import pandas as pd
+
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values, errors='coerce')
+    # pandas 按时区名处理（旧版本 pandas 不支持 ZoneInfo 对象）
+    tz = values.dt.tz
+    if tz is None:
+        return values.dt.tz_localize(BEIJING_TZ)
+    if str(tz) == BEIJING_TZ:
+        return values
+    return values.dt.tz_convert(BEIJING_TZ)
+
+
+def localize_times(df):
+    """把 DataFrame 中表示时刻的列（INSTANT_COLUMNS）原地转为北京时间，返回 df"""
+    for col in INSTANT_COLUMNS:
+        if col in df.columns:
+            df[col] = to_beijing(df[col])
+    return df
+
+
+def uploaded_since(uploaded, moment):
+    """
+    上传时间不早于 moment 的行（向量化，空值为 False）
+
+    参数:
+        uploaded (pd.Series): 上传时间列
+        moment (datetime): 时间下限（不带时区时按北京时间解释）
+
+    返回:
+        np.ndarray: 布尔数组
+    """
+    return (to_beijing(uploaded) >= as_beijing(moment)).to_numpy()
+
+
+def early_exit_reason(window, notify_mode=None):
+    """
+    本轮是否可以在拉取数据之前直接结束
+
+    只在按变化通知（SALARY_NOTIFY_MODE=delta）时成立：跳过的这一轮不写快照，
+    期间的变化会在下一次窗口内运行时一并检测并发送，不会丢失。按时间窗口通知时，
+    BG 的成本未确认提醒只看最近 30 分钟的上传，跳过会漏发，因此从不提前结束。
+
+    参数:
+        window (ReportWindow): 报告时间窗口
+        notify_mode (str): 通知模式，默认读取 SALARY_NOTIFY_MODE（delta）
+
+    返回:
+        str: 可以提前结束时返回原因，否则返回 None
+    """
+    notify_mode = notify_mode or os.getenv("SALARY_NOTIFY_MODE", "delta")
+    if notify_mode != "delta" or window.is_scheduled_time or window.is_near_hour:
+        return None
+    return f"{window.now:%H:%M} 不在整点或定时报告窗口内，变化留待下一轮窗口内运行时发送"